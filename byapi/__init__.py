@@ -1,7 +1,40 @@
 # encoding: utf-8
 
-from byapi.vm import VMClient
-from byapi.ip import IPClient
-from byapi.sg import SGClient
-from byapi.image import ImageClient
-from byapi.project import ProjectClient
+import sys
+
+from byapi.deadline import deadline
+from byapi.errors import (APIError, DeadlineExceeded, RateLimitExceeded, WaitFailed,
+                          WaitTimeout)
+
+# The clients are imported by the first access, so a tool which only uses
+# ProjectClient doesn't import the other client modules.
+_LAZY = {
+    "VMClient": "byapi.vm",
+    "IPClient": "byapi.ip",
+    "SGClient": "byapi.sg",
+    "ImageClient": "byapi.image",
+    "ProjectClient": "byapi.project",
+}
+
+__all__ = ["deadline", "APIError", "DeadlineExceeded", "RateLimitExceeded", "WaitFailed",
+           "WaitTimeout"] + sorted(_LAZY)
+
+if sys.version_info >= (3, 7):
+    from importlib import import_module
+
+    def __getattr__(name):
+        module = _LAZY.get(name)
+        if module is None:
+            raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+        value = globals()[name] = getattr(import_module(module), name)
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY))
+else:
+    # The module __getattr__ is not supported before Python 3.7.
+    from byapi.vm import VMClient
+    from byapi.ip import IPClient
+    from byapi.sg import SGClient
+    from byapi.image import ImageClient
+    from byapi.project import ProjectClient
@@ -0,0 +1,268 @@
+# encoding: utf-8
+"""The asyncio clients of the BiggerYun API.
+
+The async clients share the parameter validation, the normalization and the
+signature of the arguments with the blocking clients, but send the requests
+by aiohttp, so that a great many requests can be in flight on one event loop.
+For example,
+
+    async with AsyncVMClient(signature_key, user_id) as client:
+        vms = await asyncio.gather(*(client.detail(vmid) for vmid in vmids))
+
+Notice: it requires Python 3.6+ and aiohttp.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import asyncio
+import json
+
+from byapi.batch import BatchResult
+from byapi.client import Client
+from byapi.deadline import cap_timeout, current_deadline
+from byapi.image import ImageClient
+from byapi.ip import IPClient
+from byapi.pager import _has_next, merge_pages
+from byapi.project import ProjectClient
+from byapi.sg import SGClient
+from byapi.utils import to_unicode
+from byapi.vm import VMClient
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+# The arguments of Client which only work with the blocking requests.
+_UNSUPPORTED = ("cache", "coalesce", "retry", "rate_limiter", "instrumentation")
+
+
+class AsyncResponse(object):
+    """AsyncResponse is the HTTP response that has been read completely."""
+
+    def __init__(self, status_code, content, encoding="utf-8"):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+
+    def json(self):
+        return json.loads(to_unicode(self.content, self.encoding))
+
+
+class AiohttpTransport(object):
+    """AiohttpTransport sends the requests by a pooled aiohttp.ClientSession.
+
+    The session is created on the first request, so the transport must be used
+    on the same event loop as it was created.
+    """
+
+    def __init__(self, pool_size=100, keep_alive=True):
+        """Create a new aiohttp transport.
+
+        @param pool_size(int): The maximum number of the concurrent connections.
+        @param keep_alive(bool): If false, close the connection after each request.
+        """
+        if aiohttp is None:
+            raise ImportError("the async clients require aiohttp")
+
+        self._pool_size = pool_size
+        self._keep_alive = keep_alive
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size,
+                                             force_close=not self._keep_alive)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def send(self, url, data, timeout=None, method="GET", headers=None):
+        if isinstance(timeout, (tuple, list)):
+            timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        else:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+
+        if method == "GET":
+            params = {k: v if isinstance(v, str) else str(v) for k, v in data.items()}
+            request = self._get_session().get(url, params=params, headers=headers,
+                                              timeout=timeout)
+        else:
+            request = self._get_session().request(method, url, data=data, headers=headers,
+                                                  timeout=timeout)
+        async with request as resp:
+            return AsyncResponse(resp.status, await resp.read())
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncClient(Client):
+    """AsyncClient is the base of the asyncio clients.
+
+    All the API methods of the async clients are coroutines, and the client
+    should be closed by "await client.close()" or "async with".
+    """
+
+    def __init__(self, signature_key, user_id, transport=None, pool_size=100, **kwargs):
+        """Create a new async BiggerYun client.
+
+        @param transport(AiohttpTransport): The transport to send the requests.
+                                            If not given, create a new one,
+                                            which is closed with the client.
+        @param pool_size(int): The maximum number of the concurrent connections
+                               of the default transport.
+
+        The rest arguments are the same as Client, except that cache,
+        coalesce, retry, rate_limiter and instrumentation are not supported,
+        which raise TypeError if given.
+        """
+        for name in _UNSUPPORTED:
+            if kwargs.get(name):
+                raise TypeError("the async clients don't support {}".format(name))
+
+        own_transport = transport is None
+        if own_transport:
+            transport = AiohttpTransport(pool_size=pool_size)
+        super(AsyncClient, self).__init__(signature_key, user_id,
+                                          transport=transport, **kwargs)
+        self._own_transport = own_transport
+
+    async def request(self, action, must_authorization=True, project_id=None, stream=False,
+                      **kwargs):
+        """The same as Client.request, but it's a coroutine, and doesn't support stream.
+
+        The timeouts are capped by the deadline of the current thread when the
+        request starts.
+        """
+        if stream:
+            raise TypeError("the async clients don't support stream")
+        url, data = self._build_request(action, must_authorization, project_id, kwargs)
+        timeout = cap_timeout(self._get_timeout(action), current_deadline())
+        return self._get_result(await self._send_request(url, data, timeout, action))
+
+    async def _then(self, result, callback):
+        return callback(await result)
+
+    def _iter_records(self, fetch, page_size, prefetch, stream, as_models):
+        """The same as Client._iter_records, but return an async generator,
+        so iter_select of the async clients is used by "async for".
+        """
+        if stream:
+            raise TypeError("the async clients don't support stream")
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        return self._aiter_records(fetch, page_size, prefetch, as_models)
+
+    async def _aiter_records(self, fetch, page_size, prefetch, as_models):
+        from_dict = self.model.from_dict if as_models else None
+        offset = 0
+        next_page = fetch(offset, page_size)
+        try:
+            while next_page is not None:
+                page, next_page = await next_page, None
+                if _has_next(page, offset, page_size):
+                    offset += len(page["list"])
+                    next_page = fetch(offset, page_size)
+                    if prefetch:
+                        next_page = asyncio.ensure_future(next_page)
+
+                for record in (page["list"] if page else ()):
+                    yield record if from_dict is None else from_dict(record)
+        finally:
+            if next_page is not None:
+                if prefetch:
+                    next_page.cancel()
+                else:
+                    next_page.close()
+
+    async def _fetch_all(self, fetch, page_size, max_workers, key, as_models):
+        """The same as Client._fetch_all, but the rest pages are fetched on
+        the event loop, at most max_workers of which are in flight at once.
+        """
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+
+        first = await fetch(0, page_size)
+        if not first or not first["list"]:
+            return []
+
+        step = len(first["list"])
+        count = int(first.get("count") or 0)
+        pages = [first]
+        if count > step:
+            semaphore = asyncio.Semaphore(max_workers)
+
+            async def fetch_page(offset):
+                async with semaphore:
+                    return await fetch(offset, step)
+
+            pages.extend(await asyncio.gather(*(fetch_page(offset)
+                                                for offset in range(step, count, step))))
+
+        records = merge_pages(pages, key)
+        return self.model.from_records(records) if as_models else records
+
+    def _wait(self, waiter, ids):
+        raise TypeError("the async clients don't support the waiters, "
+                        "use the blocking clients in an executor instead")
+
+    async def _batch(self, func, items, max_workers, rate, *args, **kwargs):
+        """The same as Client._batch, but the calls are the coroutines run on
+        the event loop, at most max_workers of which are in flight at once.
+        """
+        semaphore = asyncio.Semaphore(max_workers)
+        interval = 1.0 / rate if rate else 0
+        loop = asyncio.get_event_loop()
+        next_start = loop.time()
+
+        async def call(item):
+            nonlocal next_start
+            async with semaphore:
+                if interval:
+                    now = loop.time()
+                    start = max(now, next_start)
+                    next_start = start + interval
+                    if start > now:
+                        await asyncio.sleep(start - now)
+                try:
+                    return BatchResult(item, result=await func(item, *args, **kwargs))
+                except Exception as err:
+                    return BatchResult(item, exception=err)
+
+        return list(await asyncio.gather(*(call(item) for item in items)))
+
+    async def close(self):
+        """Close the client and release the pooled connections."""
+        if self._own_transport:
+            await self._transport.close()
+
+    def __enter__(self):
+        raise TypeError('use "async with" instead')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class AsyncVMClient(AsyncClient, VMClient):
+    pass
+
+
+class AsyncIPClient(AsyncClient, IPClient):
+    pass
+
+
+class AsyncSGClient(AsyncClient, SGClient):
+    pass
+
+
+class AsyncImageClient(AsyncClient, ImageClient):
+    pass
+
+
+class AsyncProjectClient(AsyncClient, ProjectClient):
+    pass
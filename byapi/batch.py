@@ -0,0 +1,69 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from byapi.deadline import bind_deadline
+from byapi.ratelimit import TokenBucket
+
+
+class BatchResult(object):
+    """BatchResult is the result of an item of the batch.
+
+    @attr item: The item of the batch, such as the VM ID.
+    @attr result: The result of the call if it succeeded, or None.
+    @attr exception(Exception): The exception if the call failed, or None.
+    """
+
+    def __init__(self, item, result=None, exception=None):
+        self.item = item
+        self.result = result
+        self.exception = exception
+
+    @property
+    def ok(self):
+        """Return True if the call succeeded."""
+        return self.exception is None
+
+    def get(self):
+        """Return the result, or re-raise the exception of the call."""
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+    def __repr__(self):
+        if self.exception is not None:
+            return "BatchResult(item={!r}, exception={!r})".format(self.item, self.exception)
+        return "BatchResult(item={!r}, result={!r})".format(self.item, self.result)
+
+
+def run_batch(func, items, max_workers=8, rate=None):
+    """Call func for each item concurrently on a bounded thread pool.
+
+    The failure of an item doesn't abort the batch, and its exception is
+    returned in its result instead.
+
+    @param func(callable): The function to call with each item.
+    @param items(iterable): The items, such as the VM IDs.
+    @param max_workers(int): The maximum number of the concurrent calls.
+    @param rate(float): The maximum number of the calls per second. If not
+                        given, don't limit the rate.
+
+    @return(list): The list of BatchResult in the order of the items.
+    """
+    bucket = TokenBucket(rate, 1) if rate else None
+    func = bind_deadline(func)
+
+    def call(item):
+        if bucket:
+            bucket.acquire()
+        try:
+            return BatchResult(item, result=func(item))
+        except Exception as err:
+            return BatchResult(item, exception=err)
+
+    items = list(items)
+    if not items:
+        return []
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(call, items))
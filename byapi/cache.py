@@ -0,0 +1,173 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from collections import OrderedDict
+from threading import Lock
+from byapi.utils import monotonic
+
+# The idempotent actions whose responses can be cached.
+READ_ACTIONS = frozenset([
+    "vmDetail", "vmSelect", "netSelect", "securitySelect", "imageSelect",
+    "imageBaseSelect", "projectSelect",
+])
+
+_VM_ACTIONS = ("vmDetail", "vmSelect")
+
+# The read actions whose responses may be changed by the mutating actions.
+INVALIDATIONS = {
+    "vmAdd": _VM_ACTIONS + ("netSelect",),
+    "vmUpdate": _VM_ACTIONS,
+    "vmChangeStatus": _VM_ACTIONS,
+    "vmPowerDown": _VM_ACTIONS,
+    "vmDel": _VM_ACTIONS + ("netSelect",),
+    "netAdd": ("netSelect",),
+    "netUpdate": _VM_ACTIONS + ("netSelect",),
+    "netDel": _VM_ACTIONS + ("netSelect",),
+    "netBind": _VM_ACTIONS + ("netSelect",),
+    "netUnbind": _VM_ACTIONS + ("netSelect",),
+    "netRenew": ("netSelect",),
+    "netChangeRenew": ("netSelect",),
+    "securityAdd": ("securitySelect",),
+    "securityDel": _VM_ACTIONS + ("securitySelect",),
+    "securityBind": _VM_ACTIONS + ("securitySelect",),
+    "imageAdd": ("imageSelect",),
+    "imageUpdate": ("imageSelect",),
+    "imageDel": ("imageSelect",),
+}
+
+
+def make_key(action, params):
+    """Return the key of the request, which ignores the signature.
+
+    @param action(string): The API name, such as vmSelect.
+    @param params(dict): The normalized arguments of the request.
+    """
+    return action, tuple(sorted((k, v) for k, v in params.items() if k != "Signature"))
+
+
+class ResponseCache(object):
+    """ResponseCache is a thread-safe TTL and LRU cache of the API responses.
+
+    Only the responses of the read actions are cached, and the successful or
+    failed mutating actions invalidate the related responses. The cache can be
+    shared by the clients, since the key contains Local_Id, User_Id and
+    Project_Id.
+
+    Notice: the cached responses are shared by the callers, so they must not
+    be modified.
+    """
+
+    def __init__(self, maxsize=1024, ttl=5, ttls=None):
+        """Create a new response cache.
+
+        @param maxsize(int): The maximum number of the cached responses.
+        @param ttl(float): The default seconds to expire the responses.
+        @param ttls(dict): The seconds to expire the responses per action,
+                           such as {"vmSelect": 30}. 0 disables the cache of
+                           the action.
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self._maxsize = maxsize
+        self._ttls = dict.fromkeys(READ_ACTIONS, ttl)
+        self._ttls.update(ttls or {})
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+        # The generations are bumped by the invalidations, so a response read
+        # before an invalidation isn't cached after it.
+        self._generation = 0
+        self._generations = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def is_cacheable(self, action):
+        """Return True if the response of the action can be cached."""
+        return self._ttls.get(action, 0) > 0
+
+    def get(self, key):
+        """Look up the response of the request.
+
+        @param key(tuple): The key returned by make_key.
+
+        @return(tuple): (hit, response).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > monotonic():
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def generation(self, action):
+        """Return the generation of the cached responses of the action, which
+        is passed to set after the request is sent."""
+        with self._lock:
+            return self._generation, self._generations.get(action, 0)
+
+    def set(self, key, response, generation=None):
+        """Cache the response of the request.
+
+        @param key(tuple): The key returned by make_key.
+        @param response: The response data.
+        @param generation(tuple): The generation of the action before the
+                                  request was sent. If given and the action
+                                  has been invalidated since, don't cache it.
+        """
+        ttl = self._ttls.get(key[0], 0)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            if generation is not None and generation != (
+                    self._generation, self._generations.get(key[0], 0)):
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (monotonic() + ttl, response)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, actions=None):
+        """Drop the cached responses of the actions.
+
+        @param actions(iterable): The read actions. If not given, drop all.
+        """
+        with self._lock:
+            if actions is None:
+                self._generation += 1
+                keys = list(self._entries)
+            else:
+                actions = set(actions)
+                for action in actions:
+                    self._generations[action] = self._generations.get(action, 0) + 1
+                keys = [key for key in self._entries if key[0] in actions]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+    def invalidate_by(self, action):
+        """Drop the cached responses which may be changed by the mutating action."""
+        actions = INVALIDATIONS.get(action)
+        if actions:
+            self.invalidate(actions)
+
+    def stats(self):
+        """Return the statistics, such as hits, misses, etc."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
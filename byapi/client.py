@@ -1,11 +1,36 @@
 # encoding: utf-8
 from __future__ import print_function, unicode_literals, absolute_import, division
 
-import requests
+import json
+import time
 
+from collections import namedtuple
 from hashlib import md5
-from threading import Lock
-from byapi.utils import to_bytes, to_unicode, is_string
+from threading import Lock, local
+from byapi.batch import run_batch
+from byapi.cache import READ_ACTIONS, make_key
+from byapi.deadline import cap_timeout, current_deadline
+from byapi.decoding import CHUNK_SIZE, StreamedPage, loads
+from byapi.errors import APIError
+from byapi.models import ModelList
+from byapi.pager import fetch_all, iter_records
+from byapi.payload import CONTENT_TYPES, FORM, encode_body, is_url_too_long
+from byapi.signing import Signer
+from byapi.singleflight import SingleFlight
+from byapi.transport import SessionTransport
+from byapi.utils import monotonic, to_bytes, to_unicode, is_string
+
+
+# _Context is the immutable snapshot of the credential and the defaults of the
+# client. It's replaced as a whole when changed, so the readers don't need the lock.
+_Context = namedtuple("_Context", "local_id user_id project_id authorization")
+
+
+def _http_error(status_code):
+    """Return the APIError of the HTTP status code except 2xx."""
+    if status_code >= 500:
+        return APIError(status_code, "the server failed")
+    return APIError(status_code, "the HTTP request failed")
 
 
 class Client(object):
@@ -13,7 +38,10 @@ class Client(object):
 
     def __init__(self, signature_key, user_id, local_id="wuxi", project_id="0",
                  host="https://api2.biggeryun.com", post=False, thread_safe=True,
-                 encoding="utf-8", timeout=None, version="v1"):
+                 encoding="utf-8", timeout=None, version="v1", transport=None,
+                 pool_size=10, cache=None, coalesce=False, retry=None,
+                 rate_limiter=None, action_timeouts=None, instrumentation=None,
+                 body_encodings=None, max_url_length=2048, gzip_size=None):
         """Create a new BiggerYun client.
 
         @param signature_key(string): The user signature key.
@@ -22,20 +50,76 @@ class Client(object):
         @param project_id(string): The project ID, such as "0", "1", etc,
                                    which is the default project by default.
         @param host(string): The host or ip of the BiggerYun API.
-        @param thread_safe(bool): If true, the apis will use the thread lock to
-                                  ensure the api call is thread-safe.
+        @param post(bool): If true, send the arguments of all the requests in
+                           the POST body, instead of the URL query.
+        @param thread_safe(bool): If true, the methods that reset the client,
+                                  such as reset_local_id, will use the thread
+                                  lock to ensure they are thread-safe. The api
+                                  calls never need the lock.
         @param encoding(string): the encoding of the request content.
+        @param timeout(float, tuple): The seconds to wait for the server, or
+                                      a tuple (connect, read) of the seconds
+                                      to connect and to read the response.
+                                      If not given, wait forever.
+        @param transport(Transport): The transport to send the requests. If not
+                                     given, create a pooled SessionTransport
+                                     on the first request, which is closed
+                                     with the client.
+        @param pool_size(int): The maximum number of the keep-alive connections
+                               of the default transport.
+        @param cache(ResponseCache): If given, cache the responses of the read
+                                     actions, such as vmDetail and vmSelect.
+        @param coalesce(bool): If true, the concurrent identical requests of
+                               the read actions are collapsed into one, and
+                               share its result or exception.
+        @param retry(RetryPolicy): If given, retry the transient failures of
+                                   the read actions and the safe actions.
+        @param rate_limiter(RateLimiter): If given, acquire the tokens from it
+                                          before sending each request. It can
+                                          be shared by the clients of the
+                                          account, see get_rate_limiter.
+        @param action_timeouts(dict): The timeouts per action, which override
+                                      the timeout, such as {"vmAdd": (5, 120)}.
+        @param instrumentation(Instrumentation): If given, record the metrics
+                                                 of the stages of the requests
+                                                 and call its hooks.
+        @param body_encodings(dict): The encoding of the POST body per action,
+                                     "form" or "json". The default is "form".
+        @param max_url_length(int): If the URL of a GET request would be longer
+                                    than it, send the request by POST. If None,
+                                    never switch.
+        @param gzip_size(int): If given, compress the POST body by gzip when
+                               it's not shorter than gzip_size bytes.
+
+        The timeouts are capped by the deadline of the current thread, see
+        byapi.deadline.
         """
+        body_encodings = body_encodings or {}
+        for body_encoding in body_encodings.values():
+            if body_encoding not in CONTENT_TYPES:
+                raise ValueError("unknown body encoding {!r}".format(body_encoding))
+
         self._host = host.strip("/")
+        self._post = post
+        self._body_encodings = body_encodings
+        self._max_url_length = max_url_length
+        self._gzip_size = gzip_size
         self._version = version
-        self._local_id = local_id
-        self._project_id = project_id
         self._thread_safe = thread_safe
         self._encoding = encoding
         self._timeout = timeout
-
-        self._authorization = signature_key
-        self._user_id = user_id
+        self._action_timeouts = action_timeouts or {}
+        self._cache = cache
+        self._flight = SingleFlight() if coalesce else None
+        self._retry = retry
+        self._retry_budget = retry.new_budget() if retry else None
+        self._rate_limiter = rate_limiter
+        self._observers = ()
+        self._instrumentation = instrumentation
+        self._local = local()
+
+        self._context = _Context(local_id, user_id, project_id, signature_key)
+        self._signers = {}
 
         self._request_url = self._host + "/" + self._version
         self._lock = Lock()
@@ -43,8 +127,48 @@ class Client(object):
         if signature_key and not user_id:
             raise ValueError("must give user_id when using signature")
 
-    def _send_request(self, url, data):
-        return requests.get(url, params=data)
+        # The default transport is created by the first request, so the
+        # short-lived tools don't pay for importing the HTTP library.
+        self._own_transport = transport is None
+        self._pool_size = pool_size
+        self._transport = transport
+        self._transport_lock = Lock()
+
+    def _get_transport(self):
+        transport = self._transport
+        if transport is None:
+            with self._transport_lock:
+                if self._transport is None:
+                    self._transport = SessionTransport(pool_maxsize=self._pool_size)
+                transport = self._transport
+        return transport
+
+    def _send_request(self, url, data, timeout=None, action=None, stream=False):
+        # The optional arguments are only passed if needed, for the old transports.
+        kwargs = {"stream": True} if stream else {}
+        if not self._post and (self._max_url_length is None or not is_url_too_long(
+                url, data, self._max_url_length, self._encoding)):
+            return self._get_transport().send(url, data, timeout, **kwargs)
+
+        body, headers = encode_body(data, self._body_encodings.get(action, FORM),
+                                    self._encoding, self._gzip_size)
+        return self._get_transport().send(url, body, timeout, method="POST", headers=headers,
+                                          **kwargs)
+
+    def close(self):
+        """Close the client and release the pooled connections.
+
+        The transport given by the caller is not closed, because it may be
+        shared by other clients.
+        """
+        if self._own_transport and self._transport is not None:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _get_lock(self):
         if self._thread_safe:
@@ -54,7 +178,8 @@ class Client(object):
         if self._thread_safe:
             self._lock.release()
 
-    def request(self, action, must_authorization=True, project_id=None, **kwargs):
+    def request(self, action, must_authorization=True, project_id=None, stream=False,
+                **kwargs):
         """Send a request, then read the response.
 
         Notice: the method only need to be used by the API implementation, such
@@ -63,21 +188,214 @@ class Client(object):
         @param action(string): The API name, such as vmAdd, vmSelect, etc.
         @param must_authorization(bool): If true, check whether the authorization is valid.
         @param project_id(string): The project id. If not given, use the default.
+        @param stream(bool): If true, return a StreamedPage, which decodes the
+                             records of the list in the response lazily, for
+                             the select actions. The streamed responses are
+                             not cached, coalesced, retried or instrumented.
         @param kwargs(dict): The rest arguments that the API needs.
 
         @result(dict): a json response result. The common keys have "code",
                        "msg", "time", and "data".
         """
-        if must_authorization and not self._authorization:
+        if stream:
+            return self._stream(action, must_authorization, project_id, kwargs)
+
+        instrumentation = self._instrumentation
+        if instrumentation is None:
+            return self._request(action, must_authorization, project_id, kwargs)
+
+        trace = self._local.trace = instrumentation.start(action)
+        try:
+            trace.result = self._request(action, must_authorization, project_id, kwargs)
+            return trace.result
+        except Exception as err:
+            trace.exception = err
+            raise
+        finally:
+            self._local.trace = None
+            instrumentation.finish(trace)
+
+    def _get_trace(self):
+        if self._instrumentation is None:
+            return None
+        return getattr(self._local, "trace", None)
+
+    def _request(self, action, must_authorization, project_id, kwargs):
+        def build():
+            return self._build_request(action, must_authorization, project_id, kwargs)
+
+        url, data = build()
+        if action in READ_ACTIONS:
+            return self._read(action, url, data, build)
+
+        cache = self._cache
+        try:
+            result = self._call(action, url, data, build)
+        finally:
+            # Even if failed, the resources may have been changed.
+            if cache is not None:
+                cache.invalidate_by(action)
+
+        for observer in self._observers:
+            observer(action, data, result)
+        return result
+
+    def _read(self, action, url, data, build):
+        cache, flight = self._cache, self._flight
+        if cache is not None and not cache.is_cacheable(action):
+            cache = None
+        if cache is None and flight is None:
+            return self._call(action, url, data, build)
+
+        key = make_key(action, data)
+        if cache is not None:
+            hit, result = cache.get(key)
+            if hit:
+                return result
+
+        def call():
+            generation = cache.generation(action) if cache is not None else None
+            result = self._call(action, url, data, build)
+            if cache is not None:
+                cache.set(key, result, generation)
+            return result
+
+        if flight is None:
+            return call()
+        return flight.do(key, call)
+
+    def _call(self, action, url, data, build):
+        """Send the request and return the result, and retry it if failed.
+
+        @param build(callable): The function to build and sign the request
+                                again for the retry.
+        """
+        policy = self._retry
+        if policy is None or not policy.is_retryable_action(action):
+            return self._send(action, url, data)
+
+        attempt = 1
+        while True:
+            try:
+                result = self._send(action, url, data)
+            except Exception as err:
+                if (attempt >= policy.max_attempts or
+                        not policy.is_retryable_error(err, self._get_transport().retryable_errors) or
+                        not self._retry_budget.withdraw()):
+                    raise
+
+                backoff = policy.get_backoff(attempt)
+                deadline = current_deadline()
+                if deadline is not None and deadline.remaining() <= backoff:
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                trace = self._get_trace()
+                if trace is not None:
+                    trace.retries += 1
+                url, data = build()
+            else:
+                self._retry_budget.deposit()
+                return result
+
+    def _send(self, action, url, data):
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(action, deadline)
+        timeout = cap_timeout(self._get_timeout(action), deadline)
+
+        trace = self._get_trace()
+        if trace is None:
+            return self._get_result(self._send_request(url, data, timeout, action))
+
+        since = monotonic()
+        try:
+            resp = self._send_request(url, data, timeout, action)
+        finally:
+            since = trace.mark("send", since)
+        trace.request_bytes += sum(len(k) + len("{}".format(v)) + 2 for k, v in data.items())
+        trace.response_bytes += len(resp.content or b"")
+        try:
+            return self._get_result(resp)
+        finally:
+            trace.mark("decode", since)
+
+    def _stream(self, action, must_authorization, project_id, kwargs):
+        url, data = self._build_request(action, must_authorization, project_id, kwargs)
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(action, deadline)
+        timeout = cap_timeout(self._get_timeout(action), deadline)
+
+        resp = self._send_request(url, data, timeout, action, stream=True)
+        if not 200 <= resp.status_code < 300:
+            resp.close()
+            raise _http_error(resp.status_code)
+        return StreamedPage(resp.iter_content(CHUNK_SIZE), close=resp.close)
+
+    def _get_timeout(self, action):
+        return self._action_timeouts.get(action, self._timeout)
+
+    def _build_request(self, action, must_authorization, project_id, kwargs):
+        """Return the url and the normalized and signed arguments of the API."""
+        context = self._context
+        if must_authorization and not context.authorization:
             raise RuntimeError("No authorization")
 
-        self._get_lock()
-        kwargs["Local_Id"] = self._local_id
-        kwargs["User_Id"] = self._user_id
-        kwargs["Project_Id"] = self._project_id if project_id is None else project_id
-        signature_key = self._authorization
-        self._put_lock()
+        if project_id is None:
+            project_id = context.project_id
+        kwargs["Local_Id"] = context.local_id
+        kwargs["User_Id"] = context.user_id
+        kwargs["Project_Id"] = project_id
+
+        trace = self._get_trace()
+        if trace is None:
+            _kwargs = self._normalize_kwargs(kwargs)
+            _kwargs["Signature"] = self._get_signer(context, project_id).sign(_kwargs)
+            return self._request_url + "/" + action, _kwargs
+
+        since = monotonic()
+        _kwargs = self._normalize_kwargs(kwargs)
+        since = trace.mark("normalize", since)
+        _kwargs["Signature"] = self._get_signer(context, project_id).sign(_kwargs)
+        trace.mark("sign", since)
+        if trace.params is None:
+            trace.params = _kwargs
+            self._instrumentation.before(trace)
+        return self._request_url + "/" + action, _kwargs
+
+    def get_signer(self, project_id=None):
+        """Return the signer of the requests to the project.
 
+        @param project_id(string): The project id. If not given, use the default.
+
+        @return(Signer): The signer, whose sign_many can sign the requests in bulk.
+        """
+        context = self._context
+        if project_id is None:
+            project_id = context.project_id
+        return self._get_signer(context, project_id)
+
+    def _get_signer(self, context, project_id):
+        # The signer is cached until the client context is reset.
+        signer = self._signers.get((context, project_id))
+        if signer is None:
+            fixed = self._normalize_kwargs({
+                "Local_Id": context.local_id,
+                "User_Id": context.user_id,
+                "Project_Id": project_id,
+            })
+            signer = Signer(context.authorization, fixed)
+            if len(self._signers) >= 64:
+                self._signers = {}
+            self._signers[(context, project_id)] = signer
+        return signer
+
+    def _normalize_kwargs(self, kwargs):
         _kwargs = {}
         for key, value in kwargs.items():
             if value is None:
@@ -90,20 +408,88 @@ class Client(object):
                 _kwargs[key] = to_unicode(json.dumps(value), self._encoding)
             else:
                 _kwargs[key] = value
-
-        _kwargs["Signature"] = self._get_signature(_kwargs, signature_key)
-        url = self._request_url + "/" + action
-
-        return self._get_result(self._send_request(url, _kwargs))
+        return _kwargs
 
     def _get_result(self, resp):
+        # The body of a failed HTTP response, such as 429, may not be JSON.
+        if not 200 <= resp.status_code < 300:
+            raise _http_error(resp.status_code)
         if resp.content:
-            v = resp.json()
-            if v["code"] != 200:
-                raise Exception("code={}, error={}".format(v["code"], v["msg"]))
-            return v["data"]
+            return self._parse_result(loads(resp.content))
         return None
 
+    def _parse_result(self, v):
+        if v["code"] != 200:
+            raise APIError(v["code"], v["msg"])
+        return v["data"]
+
+    def _then(self, result, callback):
+        """Post-process the result of the request by the callback.
+
+        The API implementation uses it instead of handling the result of
+        request() directly, so that the async clients can share it.
+        """
+        return callback(result)
+
+    def _wait(self, waiter, ids):
+        """Wait until the resources reach the target state, see Waiter.wait."""
+        return waiter.wait(ids)
+
+    def _batch(self, func, items, max_workers, rate, *args, **kwargs):
+        """Call func(item, *args, **kwargs) for each item concurrently.
+
+        @return(list): The list of BatchResult in the order of the items.
+        """
+        return run_batch(lambda item: func(item, *args, **kwargs), items,
+                         max_workers=max_workers, rate=rate)
+
+    def _select(self, action, project_id, stream, as_models, kwargs):
+        """Send the request of a select API, see select of the clients."""
+        if stream and as_models:
+            raise ValueError("as_models can't be used with stream")
+        data = self.request(action, project_id=project_id, stream=stream, **kwargs)
+        return self._then(data, self._to_model_page) if as_models else data
+
+    def _to_model_page(self, data):
+        # The data may be shared by the cache, so it's copied.
+        if data and data.get("list") is not None:
+            data = dict(data)
+            data["list"] = ModelList(self.model, data["list"])
+        return data
+
+    def _iter_records(self, fetch, page_size, prefetch, stream, as_models):
+        """Yield the records of all the pages fetched by fetch(offset, limit),
+        or their models if as_models is true. See byapi.pager.iter_records.
+        """
+        records = iter_records(fetch, page_size, prefetch, stream)
+        return self.model.iter_models(records) if as_models else records
+
+    def _fetch_all(self, fetch, page_size, max_workers, key, as_models):
+        """Return the records of all the pages fetched by fetch(offset, limit)
+        concurrently, or their models if as_models is true. See
+        byapi.pager.fetch_all.
+        """
+        records = fetch_all(fetch, page_size, max_workers, key=key)
+        return self.model.from_records(records) if as_models else records
+
+    def add_observer(self, observer):
+        """Add the observer of the successful requests of the actions except
+        the read actions, such as vmUpdate, netBind, etc.
+
+        @param observer(callable): The function called as
+                                   observer(action, params, result), where
+                                   params are the normalized request arguments.
+        """
+        self._get_lock()
+        self._observers = self._observers + (observer,)
+        self._put_lock()
+
+    def remove_observer(self, observer):
+        """Remove the observer added by add_observer."""
+        self._get_lock()
+        self._observers = tuple(o for o in self._observers if o != observer)
+        self._put_lock()
+
     def reset_local_id(self, local_id):
         """Reset the default local id.
 
@@ -111,16 +497,13 @@ class Client(object):
         """
 
         self._get_lock()
-        self._local_id = local_id
+        self._context = self._context._replace(local_id=local_id)
         self._put_lock()
 
     def get_local_id(self):
         """Return the default local id."""
 
-        self._get_lock()
-        local_id = self._local_id
-        self._put_lock()
-        return local_id
+        return self._context.local_id
 
     def reset_default_project_id(self, project_id):
         """Reset the default project id.
@@ -129,16 +512,13 @@ class Client(object):
         """
 
         self._get_lock()
-        self._project_id = project_id
+        self._context = self._context._replace(project_id=project_id)
         self._put_lock()
 
     def get_default_project_id(self):
         """Return the default project id."""
 
-        self._get_lock()
-        project_id = self._project_id
-        self._put_lock()
-        return project_id
+        return self._context.project_id
 
     def set_signature_key(self, key, user_id=None):
         """Reset the signature key.
@@ -151,12 +531,11 @@ class Client(object):
             raise ValueError("key is empty")
 
         self._get_lock()
-        self._authorization = key
-        if user_id:
-            self._user_id = user_id
-        elif not self._user_id:
+        user_id = user_id or self._context.user_id
+        if not user_id:
             self._put_lock()
             raise ValueError("user_id is missing")
+        self._context = self._context._replace(user_id=user_id, authorization=key)
         self._put_lock()
 
     def _get_signature(self, params, signature_key):
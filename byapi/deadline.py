@@ -0,0 +1,103 @@
+# encoding: utf-8
+"""The deadline of a sequence of the API calls.
+
+The deadline is bound to the current thread, and carries across the retries,
+the pages and the batches, for example,
+
+    with deadline(60):
+        vms = client.select_all()
+        client.batch_change_status([vm["VM_Id"] for vm in vms], "restart")
+
+The timeouts of each request are capped by the remaining time, and
+DeadlineExceeded is raised when no time remains.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from contextlib import contextmanager
+from threading import local
+from byapi.errors import DeadlineExceeded
+from byapi.utils import monotonic
+
+_local = local()
+
+
+class Deadline(object):
+    def __init__(self, seconds):
+        """Create a new deadline.
+
+        @param seconds(float): The seconds from now to the deadline.
+        """
+        self.expires = monotonic() + seconds
+
+    def remaining(self):
+        """Return the remaining seconds, which is negative if expired."""
+        return self.expires - monotonic()
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has expired."""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("the deadline has expired")
+
+
+def current_deadline():
+    """Return the deadline of the current thread, or None."""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def use_deadline(d):
+    """Use the deadline, which may be None, in the current thread."""
+    outer = current_deadline()
+    _local.deadline = d
+    try:
+        yield d
+    finally:
+        _local.deadline = outer
+
+
+@contextmanager
+def deadline(seconds):
+    """Set the deadline of the calls in the block.
+
+    If there is an earlier deadline outside, keep it.
+
+    @param seconds(float): The seconds from now to the deadline.
+    """
+    d, outer = Deadline(seconds), current_deadline()
+    if outer is not None and outer.expires < d.expires:
+        d = outer
+    with use_deadline(d):
+        yield d
+
+
+def bind_deadline(func):
+    """Return the function that runs under the deadline of the current thread,
+    which is used to pass the deadline to the worker threads."""
+    d = current_deadline()
+    if d is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        with use_deadline(d):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def cap_timeout(timeout, d):
+    """Cap the timeout of the request by the remaining time of the deadline.
+
+    @param timeout(float, tuple): The timeout, or (connect, read) timeouts.
+    @param d(Deadline): The deadline, or None.
+
+    @return: The capped timeout in the same form.
+    """
+    if d is None:
+        return timeout
+
+    remaining = d.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("the deadline has expired")
+
+    if isinstance(timeout, (tuple, list)):
+        return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
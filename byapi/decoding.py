@@ -0,0 +1,231 @@
+# encoding: utf-8
+"""The decoding of the JSON responses.
+
+loads decodes a whole response body by the fastest JSON library installed,
+that is, orjson, ujson or the standard json.
+
+StreamedPage decodes the response of a select API incrementally while it's
+being received, and yields the records of the list one by one, so a large
+page is never held as a whole, neither the body nor the decoded records. For
+example,
+
+    for vm in client.select(limit=5000, stream=True):
+        print(vm["VM_Id"])
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import codecs
+import json
+import re
+
+from byapi.errors import APIError
+from byapi.utils import to_unicode
+
+CHUNK_SIZE = 65536
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+_loads = None
+
+
+def _resolve_loads():
+    """Return the loads of the fastest JSON library installed."""
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        pass
+
+    try:
+        import ujson
+        return lambda s: ujson.loads(to_unicode(s))
+    except ImportError:
+        pass
+
+    return lambda s: json.loads(to_unicode(s))
+
+
+def loads(s):
+    """Decode the JSON bytes or string by the fastest JSON library installed.
+
+    The library is imported by the first call rather than with the module,
+    so it doesn't slow down the import of byapi.
+    """
+    global _loads
+    if _loads is None:
+        _loads = _resolve_loads()
+    return _loads(s)
+
+
+class _Parser(object):
+    """_Parser reads the JSON values from the stream of the byte chunks.
+
+    Only the unread text is buffered, and each value is decoded by the C
+    scanner of the standard json from the buffer.
+    """
+
+    def __init__(self, chunks, encoding="utf-8"):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read more text into the buffer, and return False at the end."""
+        while not self._eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                text = self._decoder.decode(b"", True)
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """Return the next character except the whitespaces."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("the JSON ends unexpectedly")
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars, and return it."""
+        c = self.peek()
+        if c not in chars:
+            raise ValueError("expect {!r} but got {!r} in the JSON".format(chars, c))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """Decode and consume the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except ValueError:
+                # The value may be truncated by the end of the buffer.
+                if not self._fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer may be continued by the next chunk.
+            if end < len(self._buf) or not self._fill():
+                self._pos = end
+                return value
+
+    def end(self):
+        """Check that nothing but the whitespaces is left."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                raise ValueError("extra data after the JSON")
+            if not self._fill():
+                return
+
+
+class StreamedPage(object):
+    """StreamedPage is the lazily decoded response of a select API.
+
+    Iterating over it yields the records in data.list as they are received,
+    and it can only be iterated once. The other fields, such as count, are
+    available after they are received, which is usually at the latest when
+    the iteration completes. If the API returns an error, the iteration
+    raises APIError.
+
+    @attr fields(dict): The fields of data except the list, such as "count".
+    """
+
+    def __init__(self, chunks, close=None, encoding="utf-8"):
+        """Create a new streamed page.
+
+        @param chunks(iterable): The chunks of the response body, as bytes.
+        @param close(callable): The function to release the response, which
+                                is called when the iteration completes or
+                                the page is closed.
+        @param encoding(string): The encoding of the response body.
+        """
+        self._parser = _Parser(chunks, encoding)
+        self._close = close
+        self._iterated = False
+        self.fields = {}
+
+    @property
+    def count(self):
+        """Return the total number of the records, or None if not received yet."""
+        return self.fields.get("count")
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        if self._iterated:
+            raise RuntimeError("the streamed page can only be iterated once")
+        self._iterated = True
+        try:
+            for record in self._walk():
+                yield record
+        finally:
+            self.close()
+
+    def _walk(self):
+        p = self._parser
+        envelope = {}
+        p.expect("{")
+        if p.peek() == "}":
+            p.expect("}")
+        else:
+            while True:
+                key = p.value()
+                p.expect(":")
+                if key == "data" and p.peek() == "{":
+                    for record in self._walk_data():
+                        yield record
+                else:
+                    envelope[key] = p.value()
+                if p.expect(",}") == "}":
+                    break
+        p.end()
+
+        if envelope.get("code") != 200:
+            raise APIError(envelope.get("code"), envelope.get("msg"))
+
+    def _walk_data(self):
+        p = self._parser
+        p.expect("{")
+        if p.peek() == "}":
+            p.expect("}")
+            return
+
+        while True:
+            key = p.value()
+            p.expect(":")
+            if key == "list" and p.peek() == "[":
+                p.expect("[")
+                if p.peek() == "]":
+                    p.expect("]")
+                else:
+                    while True:
+                        yield p.value()
+                        if p.expect(",]") == "]":
+                            break
+            else:
+                self.fields[key] = p.value()
+            if p.expect(",}") == "}":
+                return
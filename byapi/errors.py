@@ -0,0 +1,57 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+
+class APIError(Exception):
+    """APIError is raised when the API returns the code except 200.
+
+    @attr code(int): The error code, or the HTTP status code if the HTTP
+                     request failed, such as 429 or 503.
+    @attr msg(string): The error message.
+    """
+
+    def __init__(self, code, msg):
+        super(APIError, self).__init__("code={}, error={}".format(code, msg))
+        self.code = code
+        self.msg = msg
+
+    def __reduce__(self):
+        return type(self), (self.code, self.msg)
+
+
+class RateLimitExceeded(Exception):
+    """RateLimitExceeded is raised when the client-side rate limit is reached
+    and the rate limiter doesn't block."""
+
+
+class DeadlineExceeded(Exception):
+    """DeadlineExceeded is raised when the deadline of the calls has expired."""
+
+
+class WaitTimeout(Exception):
+    """WaitTimeout is raised when the resources don't reach the target state
+    in time.
+
+    @attr pending(set): The IDs of the resources which are still pending.
+    """
+
+    def __init__(self, msg, pending):
+        super(WaitTimeout, self).__init__(msg)
+        self.pending = pending
+
+    def __reduce__(self):
+        return type(self), (self.args[0], self.pending)
+
+
+class WaitFailed(Exception):
+    """WaitFailed is raised when a resource has entered a failed state.
+
+    @attr record(dict): The record of the failed resource.
+    """
+
+    def __init__(self, msg, record):
+        super(WaitFailed, self).__init__(msg)
+        self.record = record
+
+    def __reduce__(self):
+        return type(self), (self.args[0], self.record)
@@ -0,0 +1,229 @@
+# encoding: utf-8
+"""The columnar export of the resources for the analytics.
+
+The records of a select API are fetched page by page, and each page is
+appended to the columns field by field, so only one page of the records is
+kept as the dicts, and the columns are filled faster than the records are
+appended one by one. The columns are exported as the RecordBatch of the
+typed arrays and the lists, or as the NumPy structured array, the Arrow table
+or the Parquet file when numpy or pyarrow is installed. For example,
+
+    vms = export_numpy(vm_client)
+    print(vms["bandwidth"].sum())
+
+    write_parquet(ip_client, "ips.parquet")
+
+Notice: the pages are sent as the other requests of the client, so they are
+retried and cached if the client has the retry policy and the cache. A page
+of the export is usually large, so a cache should not keep such pages, for
+example, with ttls={"vmSelect": 0}.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from array import array
+from itertools import islice
+from byapi.models import RecordBatch, _TYPECODES, _number
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+class ColumnBuffer(object):
+    """ColumnBuffer appends the records of a model to the columns.
+
+    The numeric fields are stored in the typed arrays, in which the missing
+    values are 0, and the other fields are the lists.
+    """
+
+    def __init__(self, model):
+        """Create a new column buffer.
+
+        @param model(type): The model of the records, such as VM.
+        """
+        self.model = model
+        self.clear()
+
+    def clear(self):
+        """Drop the records in the buffer."""
+        self.columns = {}
+        self._columns = []
+        for attr, key, type in self.model.fields:
+            column = [] if type is None else array(_TYPECODES[type])
+            self.columns[attr] = column
+            self._columns.append((key, column, type))
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, record):
+        """Append a record returned by the API."""
+        for key, column, type in self._columns:
+            value = record.get(key)
+            column.append(value if type is None else _number(type, value))
+        self._length += 1
+
+    def extend(self, records):
+        """Append the records returned by the API.
+
+        The columns are filled one by one, and a numeric column is converted
+        value by value only if the API returns any value which isn't a number,
+        such as None or a string.
+        """
+        if not isinstance(records, list):
+            records = list(records)
+
+        for key, column, type in self._columns:
+            values = [record.get(key) for record in records]
+            if type is None:
+                column.extend(values)
+                continue
+            try:
+                column.fromlist(values)  # The array is unchanged if it fails.
+            except TypeError:
+                column.fromlist([_number(type, value) for value in values])
+        self._length += len(records)
+
+    def to_batch(self):
+        """Return the records as a RecordBatch, which shares the columns."""
+        return RecordBatch(self.model, self.columns, self._length)
+
+    def to_numpy(self):
+        """Return the records as a NumPy structured array.
+
+        The numeric fields are int64 or float64, and the other fields are the
+        fixed-width unicode strings.
+        """
+        if numpy is None:
+            raise ImportError("the NumPy export requires numpy")
+
+        strings, dtype = {}, []
+        for attr, _, type in self.model.fields:
+            if type is None:
+                values = strings[attr] = ["" if v is None else "{}".format(v)
+                                          for v in self.columns[attr]]
+                width = max(len(v) for v in values) if values else 0
+                dtype.append((str(attr), str("U{}".format(max(width, 1)))))
+            else:
+                dtype.append((str(attr), str("i8" if type is int else "f8")))
+
+        result = numpy.empty(self._length, dtype=dtype)
+        for attr, _, type in self.model.fields:
+            if type is None:
+                result[attr] = strings[attr]
+            elif self._length:
+                result[attr] = numpy.asarray(self.columns[attr])
+        return result
+
+    def to_arrow(self):
+        """Return the records as a pyarrow.Table."""
+        if pyarrow is None:
+            raise ImportError("the Arrow export requires pyarrow")
+
+        arrays = []
+        for attr, _, type in self.model.fields:
+            column = self.columns[attr]
+            if type is None:
+                arrays.append(pyarrow.array([None if v is None else "{}".format(v)
+                                             for v in column], type=pyarrow.string()))
+            else:
+                arrow_type = pyarrow.int64() if type is int else pyarrow.float64()
+                arrays.append(pyarrow.array(column, type=arrow_type))
+        return pyarrow.Table.from_arrays(arrays, schema=arrow_schema(self.model))
+
+
+def arrow_schema(model):
+    """Return the pyarrow.Schema of the model."""
+    if pyarrow is None:
+        raise ImportError("the Arrow export requires pyarrow")
+
+    types = {None: pyarrow.string(), int: pyarrow.int64(), float: pyarrow.float64()}
+    return pyarrow.schema([(attr, types[type]) for attr, _, type in model.fields])
+
+
+def _iter_pages(client, page_size, kwargs):
+    """Yield the records of the client in the lists of page_size records."""
+    records = client.iter_select(page_size=page_size, **kwargs)
+    while True:
+        page = list(islice(records, page_size))
+        if not page:
+            return
+        yield page
+
+
+def export_batch(client, page_size=1000, **kwargs):
+    """Export the records of the client into a RecordBatch.
+
+    @param client(Client): The client of the resources, such as VMClient.
+    @param page_size(int): The number of the records per page.
+
+    The rest keyword arguments are passed to the iter_select of the client,
+    such as project_id.
+
+    @return(RecordBatch): The records.
+    """
+    buffer = ColumnBuffer(client.model)
+    for page in _iter_pages(client, page_size, kwargs):
+        buffer.extend(page)
+    return buffer.to_batch()
+
+
+def export_numpy(client, page_size=1000, **kwargs):
+    """Export the records of the client into a NumPy structured array.
+
+    The arguments are the same as export_batch.
+    """
+    buffer = ColumnBuffer(client.model)
+    for page in _iter_pages(client, page_size, kwargs):
+        buffer.extend(page)
+    return buffer.to_numpy()
+
+
+def export_arrow(client, page_size=1000, **kwargs):
+    """Export the records of the client into a pyarrow.Table.
+
+    The arguments are the same as export_batch.
+    """
+    buffer = ColumnBuffer(client.model)
+    for page in _iter_pages(client, page_size, kwargs):
+        buffer.extend(page)
+    return buffer.to_arrow()
+
+
+def write_parquet(client, path, page_size=1000, row_group_size=65536, **kwargs):
+    """Export the records of the client into a Parquet file.
+
+    A row group is written whenever row_group_size records are buffered, so
+    the memory doesn't grow with the number of the records.
+
+    @param path(string): The path of the Parquet file.
+    @param row_group_size(int): The number of the records per row group.
+
+    The rest arguments are the same as export_batch.
+
+    @return(int): The number of the records written.
+    """
+    if pyarrow is None:
+        raise ImportError("the Parquet export requires pyarrow")
+
+    buffer = ColumnBuffer(client.model)
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, arrow_schema(client.model)) as writer:
+        for page in _iter_pages(client, page_size, kwargs):
+            buffer.extend(page)
+            if len(buffer) >= row_group_size:
+                writer.write_table(buffer.to_arrow())
+                count += len(buffer)
+                buffer.clear()
+        if len(buffer) or not count:
+            writer.write_table(buffer.to_arrow())
+            count += len(buffer)
+    return count
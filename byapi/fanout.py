@@ -0,0 +1,148 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from byapi.deadline import bind_deadline
+from byapi.transport import SessionTransport
+
+
+class FanOutResult(object):
+    """FanOutResult is the result of the operation on a region and a project.
+
+    @attr local_id(string): The local ID, such as "wuxi".
+    @attr project_id(string): The project ID.
+    @attr result: The result of the operation if it succeeded, or None.
+    @attr exception(Exception): The exception if the operation failed, or None.
+    """
+
+    def __init__(self, local_id, project_id, result=None, exception=None):
+        self.local_id = local_id
+        self.project_id = project_id
+        self.result = result
+        self.exception = exception
+
+    @property
+    def ok(self):
+        """Return True if the operation succeeded."""
+        return self.exception is None
+
+    def __repr__(self):
+        return "FanOutResult(local_id={!r}, project_id={!r}, ok={!r})".format(
+            self.local_id, self.project_id, self.ok)
+
+
+class FanOut(object):
+    """FanOut runs an operation concurrently across the regions and the projects.
+
+    Each region has its own client bound to the local id, and the project id
+    is passed to each call, so no client state is reset. All the clients share
+    one pooled transport. For example,
+
+        with FanOut(VMClient, signature_key, user_id,
+                    [("wuxi", "0"), ("wuxi", "1"), ("beijing", "0")]) as fanout:
+            for local_id, project_id, vm in fanout.select_all():
+                print(local_id, project_id, vm["VM_Id"])
+    """
+
+    def __init__(self, client_class, signature_key, user_id, targets, max_workers=8,
+                 transport=None, **kwargs):
+        """Create a new fan-out facade.
+
+        @param client_class(type): The client class, such as VMClient.
+        @param signature_key(string): The user signature key.
+        @param user_id(string): The user id.
+        @param targets(list): The list of (local_id, project_id).
+        @param max_workers(int): The maximum number of the concurrent operations.
+        @param transport(Transport): The transport shared by the clients. If
+                                     not given, create a pooled SessionTransport,
+                                     which is closed with the facade.
+
+        The rest keyword arguments are passed to the client class.
+        """
+        self._targets = [tuple(target) for target in targets]
+        self._max_workers = max_workers
+        self._own_transport = transport is None
+        if transport is None:
+            # Each operation may send the concurrent requests, such as select_all.
+            transport = SessionTransport(pool_maxsize=max_workers * 4)
+        self._transport = transport
+
+        self._clients = {}
+        for local_id, _ in self._targets:
+            if local_id not in self._clients:
+                self._clients[local_id] = client_class(signature_key, user_id,
+                                                       local_id=local_id,
+                                                       transport=transport, **kwargs)
+
+    def close(self):
+        """Close the shared transport if it's created by the facade."""
+        if self._own_transport:
+            self._transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_client(self, local_id):
+        """Return the client of the region."""
+        return self._clients[local_id]
+
+    def run(self, func):
+        """Run the operation on all the targets, and yield the results as they
+        complete.
+
+        @param func(callable): The operation, which is called as
+                               func(client, project_id).
+
+        @return(generator): The FanOutResult, in the order of the completion.
+        """
+        func = bind_deadline(func)
+
+        def call(local_id, project_id):
+            try:
+                return FanOutResult(local_id, project_id,
+                                    result=func(self._clients[local_id], project_id))
+            except Exception as err:
+                return FanOutResult(local_id, project_id, exception=err)
+
+        if not self._targets:
+            return
+
+        executor = ThreadPoolExecutor(max_workers=min(self._max_workers, len(self._targets)))
+        futures = [executor.submit(call, local_id, project_id)
+                   for local_id, project_id in self._targets]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def map(self, func):
+        """Run the operation on all the targets, and wait for all of them.
+
+        @return(list): The FanOutResult, in the order of the targets.
+        """
+        results = dict(((r.local_id, r.project_id), r) for r in self.run(func))
+        return [results[target] for target in self._targets]
+
+    def select_all(self, **kwargs):
+        """Query the resources of all the targets by select_all of the clients,
+        and yield the records of each target as it completes.
+
+        The keyword arguments are passed to select_all, except project_id.
+
+        @return(generator): The tuples (local_id, project_id, record). If the
+                            query of a target fails, raise its exception.
+        """
+        def func(client, project_id):
+            return client.select_all(project_id=project_id, **kwargs)
+
+        for result in self.run(func):
+            if not result.ok:
+                raise result.exception
+            for record in result.result:
+                yield result.local_id, result.project_id, record
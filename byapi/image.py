@@ -2,9 +2,19 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 from byapi.client import Client
+from byapi.models import Image
+from byapi.waiter import Waiter
 
 
 class ImageClient(Client):
+    # The model of the records, see byapi.models.
+    model = Image
+
+    # The key and the values of the image status in the image information.
+    status_key = "Status"
+    status_available = "available"
+    status_failed = ("failed", "error")
+
     def create(self, vmid, name, note="", shutdown=False, project_id=None):
         """Create a new customized image.
 
@@ -14,7 +24,7 @@ class ImageClient(Client):
         @param shutdown(bool): If true, shutdown the VM before creating the image.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
@@ -23,10 +33,11 @@ class ImageClient(Client):
             "Image_Note": note,
             "Auto_Shutdown": 1 if shutdown else 0,
         }
-        self.request("imageAdd", project_id=project_id, **kwargs)
+        return self.request("imageAdd", project_id=project_id, **kwargs)
 
     def select(self, name=None, type=None, offset=None, limit=None,
-               order_by="NAME", order="asc", project_id=None):
+               order_by="NAME", order="asc", project_id=None, stream=False,
+               as_models=False):
         """Query the information of the official or customized images.
 
         If giving the argument type, query the official or customized images.
@@ -40,6 +51,10 @@ class ImageClient(Client):
         @param order_by(string): The order field, such as "NAME".
         @param order(string): The order method, such as "asc" or "desc".
         @param project_id(string): The project id. If not given, use the default.
+        @param stream(bool): If true, return a StreamedPage, which yields the
+                             records lazily while the response is received.
+        @param as_models(bool): If true, the list is a ModelList, which builds
+                                the models of the records lazily.
 
         @return(dict):
             @key count(int): the total number.
@@ -55,9 +70,53 @@ class ImageClient(Client):
 
         if type:
             kwargs["Image_Type"] = type
-            return self.request("imageBaseSelect", project_id=project_id, **kwargs)
+            return self._select("imageBaseSelect", project_id, stream, as_models, kwargs)
+
+        return self._select("imageSelect", project_id, stream, as_models, kwargs)
+
+    def iter_select(self, name=None, type=None, order_by="NAME", order="asc",
+                    project_id=None, page_size=100, prefetch=False, stream=False,
+                    as_models=False):
+        """Iterate over the images in all the pages, which are fetched lazily.
+
+        @param page_size(int): The number of the images per page.
+        @param prefetch(bool): If true, fetch the next page in the background.
+        @param stream(bool): If true, decode each page lazily while it's received,
+                             which can't be used with prefetch.
+        @param as_models(bool): If true, yield the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(generator): The images.
+        """
 
-        return self.request("imageSelect", project_id=project_id, **kwargs)
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(name=name, type=type, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id,
+                               stream=stream)
+        return self._iter_records(fetch, page_size, prefetch, stream, as_models)
+
+    def select_all(self, name=None, type=None, order_by="NAME", order="asc",
+                   project_id=None, page_size=100, max_workers=4, as_models=False):
+        """Query the images in all the pages, which are fetched concurrently.
+
+        @param page_size(int): The number of the images per page.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param as_models(bool): If true, return the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(list): The image list, in which the duplicated images are dropped.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(name=name, type=type, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id)
+        return self._fetch_all(fetch, page_size, max_workers, "Image_Id", as_models)
 
     def update(self, image_id, image_name, image_note, project_id=None):
         """Update the name and the note of the customized image.
@@ -67,7 +126,7 @@ class ImageClient(Client):
         @param image_note(string): The image note.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
@@ -75,7 +134,7 @@ class ImageClient(Client):
             "Image_Name": image_name,
             "Image_Note": image_note,
         }
-        self.request("imageUpdate", project_id=project_id, **kwargs)
+        return self.request("imageUpdate", project_id=project_id, **kwargs)
 
     def delete(self, image_id, project_id=None):
         """Delete the customized image by the image ID.
@@ -83,7 +142,46 @@ class ImageClient(Client):
         @param image_id(string): The image id.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
+        """
+
+        return self.request("imageDel", project_id=project_id, Image_Id=image_id)
+
+    def wait_until_created(self, names, timeout=1800, delay=5, max_delay=60,
+                           page_size=100, project_id=None):
+        """Wait until all the customized images are created and available.
+
+        The images are checked together by walking the pages of imageSelect,
+        or by imageSelect of each name if there are fewer pending images than
+        the pages, and the interval between the polls grows while no image
+        makes progress.
+
+        @param names(list): The image names given to create.
+        @param timeout(float): The maximum seconds to wait.
+        @param delay(float): The initial seconds between the polls.
+        @param max_delay(float): The maximum seconds between the polls.
+        @param page_size(int): The number of the images per page of imageSelect.
+        @param project_id(string): The project id. If not given, use the default.
+
+        @return(dict): The image information by the names. If timeout, raise
+                       WaitTimeout with the pending names, or if an image has
+                       failed, raise WaitFailed.
         """
 
-        self.request("imageDel", project_id=project_id, Image_Id=image_id)
+        def fetch():
+            return self.iter_select(page_size=page_size, project_id=project_id)
+
+        def detail(name):
+            images = self.iter_select(name=name, project_id=project_id)
+            return next((i for i in images if i.get("Image_Name") == name), None)
+
+        def predicate(image):
+            return image is not None and image.get(self.status_key) == self.status_available
+
+        def failed(image):
+            return image.get(self.status_key) in self.status_failed
+
+        waiter = Waiter(fetch, "Image_Name", predicate, failed=failed, delay=delay,
+                        max_delay=max_delay, timeout=timeout, detail=detail,
+                        page_size=page_size)
+        return self._wait(waiter, names)
@@ -0,0 +1,240 @@
+# encoding: utf-8
+"""The instrumentation of the requests of the clients.
+
+Instrumentation records the latency of each stage of the requests per action,
+that is, "normalize" (the normalization of the arguments), "sign" (the
+signature), "send" (the HTTP request, including the DNS, the connection and
+the TLS handshake), "decode" (the JSON decoding) and "total", and the payload
+sizes, the retries and the error codes. The hooks are called before and after
+each request, and the exporters render the metrics. For example,
+
+    instrumentation = Instrumentation()
+    instrumentation.add_post_hook(LoggingExporter())
+    client = VMClient(signature_key, user_id, instrumentation=instrumentation)
+    ...
+    print(PrometheusExporter(instrumentation).render())
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import json
+import logging
+
+from bisect import bisect_left
+from threading import Lock
+from byapi.errors import APIError
+from byapi.utils import monotonic
+
+
+STAGES = ("normalize", "sign", "send", "decode", "total")
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram(object):
+    """Histogram counts the observed values in the buckets."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket of the quantile, such as 0.99."""
+        if not self.count:
+            return None
+        rank, total = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            total += n
+            if total >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Trace(object):
+    """Trace is the record of a request passed to the hooks.
+
+    @attr action(string): The API name.
+    @attr params(dict): The normalized and signed arguments, or None if the
+                        request failed to build.
+    @attr stages(dict): The seconds of the stages.
+    @attr retries(int): The number of the retries.
+    @attr request_bytes(int): The size of the request arguments.
+    @attr response_bytes(int): The size of the response body.
+    @attr result: The result of the request.
+    @attr exception(Exception): The exception if the request failed, or None.
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.params = None
+        self.started = monotonic()
+        self.stages = {}
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.result = None
+        self.exception = None
+
+    def mark(self, stage, since):
+        """Add the seconds from since to now to the stage, and return now."""
+        now = monotonic()
+        self.stages[stage] = self.stages.get(stage, 0) + now - since
+        return now
+
+    @property
+    def error_code(self):
+        """Return the API error code, the name of the exception, or None."""
+        if self.exception is None:
+            return None
+        if isinstance(self.exception, APIError):
+            return self.exception.code
+        return type(self.exception).__name__
+
+
+class Instrumentation(object):
+    """Instrumentation collects the metrics of the requests and calls the hooks.
+
+    It can be shared by the clients.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self._latency_buckets = latency_buckets
+        self._size_buckets = size_buckets
+        self._lock = Lock()
+        self._pre_hooks = ()
+        self._post_hooks = ()
+        self.reset()
+
+    def reset(self):
+        """Clear the metrics."""
+        with self._lock:
+            self.latencies = {}      # (action, stage) -> Histogram
+            self.sizes = {}          # (action, "request" or "response") -> Histogram
+            self.requests = {}       # action -> number
+            self.retries = {}        # action -> number
+            self.errors = {}         # (action, code) -> number
+
+    def add_pre_hook(self, hook):
+        """Add the hook called as hook(trace) before sending each request."""
+        self._pre_hooks = self._pre_hooks + (hook,)
+
+    def add_post_hook(self, hook):
+        """Add the hook called as hook(trace) after each request completes."""
+        self._post_hooks = self._post_hooks + (hook,)
+
+    def start(self, action):
+        return Trace(action)
+
+    def before(self, trace):
+        for hook in self._pre_hooks:
+            hook(trace)
+
+    def finish(self, trace):
+        trace.stages["total"] = monotonic() - trace.started
+        action = trace.action
+
+        with self._lock:
+            for stage, seconds in trace.stages.items():
+                histogram = self.latencies.get((action, stage))
+                if histogram is None:
+                    histogram = self.latencies[(action, stage)] = Histogram(self._latency_buckets)
+                histogram.observe(seconds)
+
+            for kind, size in (("request", trace.request_bytes), ("response", trace.response_bytes)):
+                if size:
+                    histogram = self.sizes.get((action, kind))
+                    if histogram is None:
+                        histogram = self.sizes[(action, kind)] = Histogram(self._size_buckets)
+                    histogram.observe(size)
+
+            self.requests[action] = self.requests.get(action, 0) + 1
+            if trace.retries:
+                self.retries[action] = self.retries.get(action, 0) + trace.retries
+            if trace.exception is not None:
+                key = (action, trace.error_code)
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+        for hook in self._post_hooks:
+            hook(trace)
+
+
+def _labels(**labels):
+    return ",".join('{}="{}"'.format(k, "{}".format(v).replace("\\", "\\\\").replace('"', '\\"'))
+                    for k, v in sorted(labels.items()))
+
+
+class PrometheusExporter(object):
+    """PrometheusExporter renders the metrics in the Prometheus text format."""
+
+    def __init__(self, instrumentation, prefix="byapi"):
+        self._instrumentation = instrumentation
+        self._prefix = prefix
+
+    def _histogram(self, lines, name, help, histograms, label):
+        lines.append("# HELP {} {}".format(name, help))
+        lines.append("# TYPE {} histogram".format(name))
+        for (action, value), histogram in sorted(histograms.items(), key=lambda i: "{}".format(i[0])):
+            total = 0
+            for bound, n in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                total += n
+                labels = _labels(action=action, le=bound, **{label: value})
+                lines.append("{}_bucket{{{}}} {}".format(name, labels, total))
+            labels = _labels(action=action, **{label: value})
+            lines.append("{}_sum{{{}}} {}".format(name, labels, histogram.sum))
+            lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+
+    def _counter(self, lines, name, help, counters):
+        lines.append("# HELP {} {}".format(name, help))
+        lines.append("# TYPE {} counter".format(name))
+        for labels, value in sorted(counters, key=lambda i: i[0]):
+            lines.append("{}{{{}}} {}".format(name, labels, value))
+
+    def render(self):
+        """Return the metrics as the Prometheus text."""
+        m, p = self._instrumentation, self._prefix
+        with m._lock:
+            lines = []
+            self._histogram(lines, p + "_request_duration_seconds",
+                            "The seconds of the stages of the requests.",
+                            m.latencies, "stage")
+            self._histogram(lines, p + "_payload_bytes",
+                            "The size of the request arguments and the response body.",
+                            m.sizes, "direction")
+            self._counter(lines, p + "_requests_total", "The number of the requests.",
+                          [(_labels(action=a), n) for a, n in m.requests.items()])
+            self._counter(lines, p + "_retries_total", "The number of the retries.",
+                          [(_labels(action=a), n) for a, n in m.retries.items()])
+            self._counter(lines, p + "_errors_total", "The number of the failed requests.",
+                          [(_labels(action=a, code=c), n) for (a, c), n in m.errors.items()])
+        return "\n".join(lines) + "\n"
+
+
+class LoggingExporter(object):
+    """LoggingExporter logs each request as a structured JSON line.
+
+    It's used as the post hook of Instrumentation.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self._logger = logger or logging.getLogger("byapi")
+        self._level = level
+
+    def __call__(self, trace):
+        if not self._logger.isEnabledFor(self._level):
+            return
+
+        record = {
+            "action": trace.action,
+            "stages": dict((k, round(v, 6)) for k, v in trace.stages.items()),
+            "retries": trace.retries,
+            "request_bytes": trace.request_bytes,
+            "response_bytes": trace.response_bytes,
+            "error": trace.error_code,
+        }
+        self._logger.log(self._level, json.dumps(record, sort_keys=True))
@@ -0,0 +1,295 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import time
+
+from threading import Lock
+from byapi.batch import run_batch
+
+# The key of the ID and the indexed fields of the records of each kind.
+KINDS = {
+    "vm": ("VM_Id", ("VM_Name", "Outer_Ip", "Group_Id")),
+    "ip": ("Group_Id", ("Outer_Ip", "VM_Name")),
+    "sg": ("Security_Group_Id", ("Security_Group_Name",)),
+    "image": ("Image_Id", ("Image_Name",)),
+}
+
+# The kind, the argument of the ID, and whether the resource is deleted, of
+# the mutating actions which change a single resource.
+_MUTATIONS = {
+    "vmUpdate": ("vm", "VM_Id", False),
+    "vmChangeStatus": ("vm", "VM_Id", False),
+    "vmPowerDown": ("vm", "VM_Id", False),
+    "vmDel": ("vm", "VM_Id", True),
+    "netUpdate": ("ip", "Group_Id", False),
+    "netBind": ("ip", "Group_Id", False),
+    "netUnbind": ("ip", "Group_Id", False),
+    "netRenew": ("ip", "Group_Id", False),
+    "netChangeRenew": ("ip", "Group_Id", False),
+    "netDel": ("ip", "Group_Id", True),
+    "securityDel": ("sg", "Security_Group_Id", True),
+    "imageUpdate": ("image", "Image_Id", False),
+    "imageDel": ("image", "Image_Id", True),
+}
+
+# The kinds which must be synced fully after the mutating actions, because
+# the changed resources can't be known from the arguments.
+_KIND_MUTATIONS = {
+    "netAdd": ("ip",),
+    "securityAdd": ("sg",),
+    "imageAdd": ("image",),
+}
+
+
+class _Table(object):
+    def __init__(self, key, fields):
+        self.key = key
+        self.fields = fields
+        self.records = {}
+        self.indexes = dict((field, {}) for field in fields)
+        self.synced_at = None
+        self.dirty = set()
+        self.dirty_all = False
+
+    def put(self, record):
+        rid = record.get(self.key)
+        if rid is None:
+            return
+        self.remove(rid)
+        self.records[rid] = record
+        for field in self.fields:
+            value = record.get(field)
+            if value not in (None, ""):
+                self.indexes[field].setdefault(value, set()).add(rid)
+
+    def remove(self, rid):
+        record = self.records.pop(rid, None)
+        if record is None:
+            return
+        for field in self.fields:
+            ids = self.indexes[field].get(record.get(field))
+            if ids is not None:
+                ids.discard(rid)
+                if not ids:
+                    del self.indexes[field][record.get(field)]
+
+    def replace(self, records):
+        self.records = {}
+        self.indexes = dict((field, {}) for field in self.fields)
+        for record in records:
+            self.put(record)
+
+    def lookup(self, field, value):
+        return [self.records[rid] for rid in self.indexes[field].get(value, ())]
+
+
+class Inventory(object):
+    """Inventory is the thread-safe in-process mirror of the resources of a project.
+
+    It's filled by the select APIs, and the VMs, the public ips, the security
+    groups and the images are indexed by the ID and the fields in KINDS, so
+    the lookups don't need any request. For example,
+
+        inventory = Inventory(vm_client=vm_client, ip_client=ip_client)
+        inventory.sync()
+        vm = inventory.vm_by_ip("1.2.3.4")
+
+    The inventory observes the mutating requests of the clients. The deleted
+    resources are removed locally at once, and the changed resources are
+    marked dirty and re-fetched alone by the next sync, such as vmDetail for
+    a VM. A kind is synced fully when it's older than max_age, or when the
+    changed resources can't be known, such as after netAdd.
+    """
+
+    def __init__(self, vm_client=None, ip_client=None, sg_client=None,
+                 image_client=None, project_id=None, max_age=300, page_size=100,
+                 max_workers=4):
+        """Create a new inventory.
+
+        @param vm_client(VMClient): The client to sync the VMs.
+        @param ip_client(IPClient): The client to sync the public ips.
+        @param sg_client(SGClient): The client to sync the security groups.
+        @param image_client(ImageClient): The client to sync the images.
+        @param project_id(string): The project id. If not given, use the
+                                   default of the clients.
+        @param max_age(float): The maximum seconds before a kind is synced fully.
+        @param page_size(int): The number of the records per page.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        """
+        clients = {"vm": vm_client, "ip": ip_client, "sg": sg_client, "image": image_client}
+        self._clients = dict((kind, c) for kind, c in clients.items() if c is not None)
+        if not self._clients:
+            raise ValueError("no client is given")
+
+        if project_id is None:
+            project_id = next(iter(self._clients.values())).get_default_project_id()
+        self.project_id = project_id
+
+        self._max_age = max_age
+        self._page_size = page_size
+        self._max_workers = max_workers
+        self._tables = dict((kind, _Table(*KINDS[kind])) for kind in self._clients)
+        self._lock = Lock()
+
+        for c in self._clients.values():
+            c.add_observer(self._on_mutation)
+
+    def close(self):
+        """Stop observing the clients."""
+        for c in self._clients.values():
+            c.remove_observer(self._on_mutation)
+
+    def _on_mutation(self, action, params, result):
+        if "{}".format(params.get("Project_Id")) != "{}".format(self.project_id):
+            return
+
+        with self._lock:
+            if action in _MUTATIONS:
+                kind, arg, deleted = _MUTATIONS[action]
+                table = self._tables.get(kind)
+                rid = params.get(arg)
+                if table is not None and rid is not None:
+                    if deleted:
+                        table.remove(rid)
+                        table.dirty.discard(rid)
+                    else:
+                        table.dirty.add(rid)
+
+            vms, ips = self._tables.get("vm"), self._tables.get("ip")
+            if vms is not None:
+                if action == "vmAdd" and result:
+                    for vm in result["VG_Id"].split(","):
+                        if vm.strip():
+                            vms.dirty.add(vm.split("|")[0].strip())
+                elif action in ("netBind", "securityBind"):
+                    vmid = params.get("Resource_Id") or params.get("VM_Id")
+                    if vmid:
+                        vms.dirty.add(vmid)
+                elif action == "netUnbind" and ips is not None:
+                    ip = ips.records.get(params.get("Group_Id"))
+                    if ip and ip.get("Outer_Ip"):
+                        for vm in vms.lookup("Outer_Ip", ip["Outer_Ip"]):
+                            vms.dirty.add(vm["VM_Id"])
+
+            if ips is not None and action in ("vmAdd", "vmDel"):
+                # The public ip of the VM may be allocated or released.
+                ips.dirty_all = True
+
+            for kind in _KIND_MUTATIONS.get(action, ()):
+                if kind in self._tables:
+                    self._tables[kind].dirty_all = True
+
+    def sync(self, kinds=None, force=False):
+        """Sync the kinds of the resources, which only re-fetches the changed
+        resources if possible.
+
+        @param kinds(list): The kinds, such as "vm", "ip", "sg" and "image".
+                            If not given, sync all the kinds of the clients.
+        @param force(bool): If true, sync the kinds fully.
+        """
+        for kind in kinds or list(self._tables):
+            table = self._tables[kind]
+            with self._lock:
+                full = (force or table.dirty_all or table.synced_at is None or
+                        time.time() - table.synced_at > self._max_age)
+                dirty, table.dirty, table.dirty_all = table.dirty, set(), False
+
+            if full:
+                started = time.time()
+                records = self._clients[kind].select_all(project_id=self.project_id,
+                                                         page_size=self._page_size,
+                                                         max_workers=self._max_workers)
+                with self._lock:
+                    table.replace(records)
+                    table.synced_at = started
+            elif dirty:
+                self._refresh(kind, table, dirty)
+
+    def _refresh(self, kind, table, ids):
+        c = self._clients[kind]
+        if kind == "vm":
+            results = c.batch_detail(ids, project_id=self.project_id,
+                                     max_workers=self._max_workers)
+            records = dict((r.item, [r.result] if r.result else []) for r in results if r.ok)
+        elif kind == "ip":
+            results = run_batch(lambda i: c.select(group_id=i, project_id=self.project_id),
+                                ids, max_workers=self._max_workers)
+            records = dict((r.item, [ip for ip in r.result["list"] if ip.get("Group_Id") == r.item])
+                           for r in results if r.ok and r.result)
+        else:
+            # No API can query a single security group or image.
+            with self._lock:
+                table.dirty_all = True
+            return self.sync([kind])
+
+        with self._lock:
+            for rid in ids:
+                if rid not in records:
+                    table.dirty.add(rid)  # Failed, and retry by the next sync.
+                elif records[rid]:
+                    table.put(records[rid][0])
+                else:
+                    table.remove(rid)
+
+    def restore(self, snapshot):
+        """Fill the inventory from the snapshot, so the next sync only fetches
+        the kinds which are older than max_age.
+
+        @param snapshot(Snapshot): The snapshot of the same project.
+        """
+        if "{}".format(snapshot.project_id) != "{}".format(self.project_id):
+            raise ValueError("the snapshot is of another project")
+
+        for kind in snapshot.kinds:
+            table = self._tables.get(kind)
+            if table is None:
+                continue
+            records = snapshot.records(kind)
+            with self._lock:
+                table.replace(records)
+                table.synced_at = snapshot.synced_at(kind)
+
+    @property
+    def kinds(self):
+        """Return the kinds of the resources in the inventory."""
+        return list(self._tables)
+
+    def get(self, kind, rid):
+        """Return the record of the resource by the ID, or None."""
+        with self._lock:
+            return self._tables[kind].records.get(rid)
+
+    def lookup(self, kind, field, value):
+        """Return the list of the records whose field is the value.
+
+        @param kind(string): The kind, such as "vm".
+        @param field(string): The indexed field of the kind in KINDS, such as "Outer_Ip".
+        @param value: The value of the field.
+        """
+        with self._lock:
+            return self._tables[kind].lookup(field, value)
+
+    def records(self, kind):
+        """Return the list of all the records of the kind."""
+        with self._lock:
+            return list(self._tables[kind].records.values())
+
+    def synced_at(self, kind):
+        """Return the timestamp of the last full sync of the kind, or None."""
+        with self._lock:
+            return self._tables[kind].synced_at
+
+    def vm_by_ip(self, outer_ip):
+        """Return the VM which owns the public ip, or None."""
+        if "vm" not in self._tables:
+            raise ValueError("the inventory has no VM")
+
+        with self._lock:
+            vms, ips = self._tables["vm"], self._tables.get("ip")
+            found = vms.lookup("Outer_Ip", outer_ip)
+            if not found and ips is not None:
+                for ip in ips.lookup("Outer_Ip", outer_ip):
+                    if ip.get("VM_Name"):
+                        found = vms.lookup("VM_Name", ip["VM_Name"])
+                        break
+            return found[0] if found else None
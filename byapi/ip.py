@@ -2,9 +2,14 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 from byapi.client import Client
+from byapi.models import PublicIP
+from byapi.waiter import Waiter
 
 
 class IPClient(Client):
+    # The model of the records, see byapi.models.
+    model = PublicIP
+
     def create(self, bandwidth=2, count_type="month", number=1, num=1,
                net_type="BGP", auto_renew=True, shbw_id=None, project_id=None):
         """Apply for a new public ip.
@@ -38,11 +43,14 @@ class IPClient(Client):
             kwargs["Shbw_Id"] = shbw_id
 
         data = self.request("netAdd", project_id=project_id, **kwargs)
+        return self._then(data, self._parse_group_ids)
+
+    def _parse_group_ids(self, data):
         return [i for i in data["Group_Id"].strip().split(",") if i]
 
     def select(self, group_id=None, status=None, outer_ip=None, vm_name=None,
                offset=None, limit=None, order_by="RI_GROUP_IP", order="asc",
-               project_id=None):
+               project_id=None, stream=False, as_models=False):
         """Query the information of the public ips.
 
         @param group_id(string): The id of the charging account.
@@ -54,6 +62,10 @@ class IPClient(Client):
         @param order_by(string): The order field, such as "RI_GROUP_IP".
         @param order(string): The order method, such as "asc" or "desc".
         @param project_id(string): The project id. If not given, use the default.
+        @param stream(bool): If true, return a StreamedPage, which yields the
+                             records lazily while the response is received.
+        @param as_models(bool): If true, the list is a ModelList, which builds
+                                the models of the records lazily.
 
         @return(dict):
             @key count(int): the total number.
@@ -73,7 +85,54 @@ class IPClient(Client):
         if vm_name:
             kwargs["VM_Name"] = vm_name
 
-        return self.request("netSelect", project_id=project_id, **kwargs)
+        return self._select("netSelect", project_id, stream, as_models, kwargs)
+
+    def iter_select(self, group_id=None, status=None, outer_ip=None, vm_name=None,
+                    order_by="RI_GROUP_IP", order="asc", project_id=None,
+                    page_size=100, prefetch=False, stream=False, as_models=False):
+        """Iterate over the public ips in all the pages, which are fetched lazily.
+
+        @param page_size(int): The number of the ips per page.
+        @param prefetch(bool): If true, fetch the next page in the background.
+        @param stream(bool): If true, decode each page lazily while it's received,
+                             which can't be used with prefetch.
+        @param as_models(bool): If true, yield the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(generator): The public ips.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(group_id=group_id, status=status, outer_ip=outer_ip,
+                               vm_name=vm_name, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id,
+                               stream=stream)
+        return self._iter_records(fetch, page_size, prefetch, stream, as_models)
+
+    def select_all(self, group_id=None, status=None, outer_ip=None, vm_name=None,
+                   order_by="RI_GROUP_IP", order="asc", project_id=None,
+                   page_size=100, max_workers=4, as_models=False):
+        """Query the public ips in all the pages, which are fetched concurrently.
+
+        @param page_size(int): The number of the ips per page.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param as_models(bool): If true, return the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(list): The ip list, in which the duplicated ips are dropped.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(group_id=group_id, status=status, outer_ip=outer_ip,
+                               vm_name=vm_name, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id)
+        return self._fetch_all(fetch, page_size, max_workers, "Group_Id", as_models)
 
     def update(self, group_id, bandwidth, project_id=None):
         """Modify the bandwidth of the public ip.
@@ -82,7 +141,7 @@ class IPClient(Client):
         @param bandwidth(int): The size of the bandwidth, between 2 and 200.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         self._validate_bandwidth(bandwidth)
@@ -91,7 +150,7 @@ class IPClient(Client):
             "Group_Id": group_id,
             "Bandwidth": bandwidth,
         }
-        self.request("netUpdate", project_id=project_id, **kwargs)
+        return self.request("netUpdate", project_id=project_id, **kwargs)
 
     def delete(self, group_id, project_id=None):
         """Delete and release the public ip.
@@ -99,10 +158,10 @@ class IPClient(Client):
         @param group_id(string): The id of the charging account.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
-        self.request("netDel", project_id=project_id, Group_Id=group_id)
+        return self.request("netDel", project_id=project_id, Group_Id=group_id)
 
     def bind(self, group_id, vm_id, project_id=None):
         """Bind the public ip to a certain VM or shared bandwidth.
@@ -111,14 +170,14 @@ class IPClient(Client):
         @param vm_id(string): the VM ID.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
             "Group_Id": group_id,
             "Resource_Id": vm_id,
         }
-        self.request("netBind", project_id=project_id, **kwargs)
+        return self.request("netBind", project_id=project_id, **kwargs)
 
     def unbind(self, group_id, project_id=None):
         """Unbind the public ip from a certain VM or shared bandwidth.
@@ -126,10 +185,10 @@ class IPClient(Client):
         @param group_id(string): The id of the charging account.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
-        self.request("netUnbind", project_id=project_id, Group_Id=group_id)
+        return self.request("netUnbind", project_id=project_id, Group_Id=group_id)
 
     def renew(self, group_id, count_type="month", number=1, auto_renew=None,
               project_id=None):
@@ -142,7 +201,7 @@ class IPClient(Client):
         @param auto_renew(bool): if true, renew the account automatically.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         self._validate_count_type(count_type, number)
@@ -155,7 +214,7 @@ class IPClient(Client):
         if auto_renew is not None:
             kwargs["Auto_Renew"] = auto_renew
 
-        self.request("netRenew", project_id=project_id, **kwargs)
+        return self.request("netRenew", project_id=project_id, **kwargs)
 
     def change_renew(self, group_id, auto_renew=True, project_id=None):
         """Change whether to renew for the public ip.
@@ -164,11 +223,51 @@ class IPClient(Client):
         @param auto_renew(bool): if true, renew the account automatically.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
             "Group_Id": group_id,
             "Auto_Renew": auto_renew,
         }
-        self.request("netChangeRenew", project_id=project_id, **kwargs)
+        return self.request("netChangeRenew", project_id=project_id, **kwargs)
+
+    def wait_for_status(self, group_ids, status, timeout=600, delay=1, max_delay=30,
+                        page_size=100, project_id=None):
+        """Wait until all the public ips reach the status.
+
+        The ips are checked together by walking the pages of netSelect, or
+        by netSelect of each ip if there are fewer pending ips than the
+        pages, and the interval between the polls grows while no ip makes
+        progress.
+
+        @param group_ids(list): The ids of the charging accounts.
+        @param status(string): The target status, such as "bind", "unbind".
+        @param timeout(float): The maximum seconds to wait.
+        @param delay(float): The initial seconds between the polls.
+        @param max_delay(float): The maximum seconds between the polls.
+        @param page_size(int): The number of the ips per page of netSelect.
+        @param project_id(string): The project id. If not given, use the default.
+
+        @return(dict): The ip information by the ids. If timeout, raise
+                       WaitTimeout with the pending ids.
+        """
+
+        def fetch():
+            return self.iter_select(page_size=page_size, project_id=project_id)
+
+        def detail(group_id):
+            ips = self.iter_select(group_id=group_id, project_id=project_id)
+            return next((ip for ip in ips if ip.get("Group_Id") == group_id), None)
+
+        def predicate(ip):
+            return ip is not None and ip.get("Status") == status
+
+        waiter = Waiter(fetch, "Group_Id", predicate, delay=delay, max_delay=max_delay,
+                        timeout=timeout, detail=detail, page_size=page_size)
+        return self._wait(waiter, group_ids)
+
+    def wait_until_bound(self, group_ids, **kwargs):
+        """Wait until all the public ips are bound. See wait_for_status."""
+
+        return self.wait_for_status(group_ids, "bind", **kwargs)
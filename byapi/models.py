@@ -0,0 +1,345 @@
+# encoding: utf-8
+"""The compact models of the resources.
+
+The API returns the records as dicts, which the clients return by default.
+For many records, the models are much smaller, because the fields are kept
+in the __slots__ instead of a dict per record, and the fields are accessed
+as the attributes, such as vm.outer_ip. The keys of the records which are
+not the fields of the model are kept in the attribute extra. For example,
+
+    vms = client.select_all(as_models=True)
+    batch = RecordBatch.from_models(VM, vms)
+    print(batch.sum("bandwidth"), batch.group_sum("os_version", "memory_size"))
+
+The list of select(as_models=True) is a ModelList, which builds the models
+of the records only when they are accessed, for example,
+
+    page = client.select(limit=100, as_models=True)
+    print(page["list"][0].outer_ip)
+
+The models can also be read by the API keys like the dicts, such as
+vm["VM_Id"], for the code written for the records. A field missing from the
+record reads as None, the same as null.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from array import array
+
+try:
+    array(str("q"))
+    _INT_TYPECODE = str("q")
+except ValueError:  # Python 2
+    _INT_TYPECODE = str("l")
+
+_TYPECODES = {int: _INT_TYPECODE, float: str("d")}
+
+
+def _number(type, value):
+    if value is None or value == "":
+        return 0
+    try:
+        return type(value)
+    except (TypeError, ValueError):
+        return type(float(value))
+
+
+class Model(object):
+    """Model is the base of the models of the resources.
+
+    @attr fields(tuple): The tuples (attribute, API key, type) of the fields,
+                         the type is int or float for the numeric fields, or
+                         None.
+    @attr key(string): The API key of the ID.
+    """
+
+    __slots__ = ("extra",)
+
+    fields = ()
+    key = None
+
+    def __init__(self, **kwargs):
+        for attr, _, _ in self.fields:
+            setattr(self, attr, kwargs.pop(attr, None))
+        self.extra = kwargs or None
+
+    @classmethod
+    def _keys(cls):
+        keys = cls.__dict__.get("_key_map")
+        if keys is None:
+            keys = dict((key, attr) for attr, key, _ in cls.fields)
+            setattr(cls, "_key_map", keys)
+        return keys
+
+    @classmethod
+    def from_dict(cls, record):
+        """Build the model from a record returned by the API."""
+        obj = cls.__new__(cls)
+        keys = cls._keys()
+        for attr, key, _ in cls.fields:
+            setattr(obj, attr, record.get(key))
+        extra = None
+        if any(key not in keys for key in record):
+            extra = dict((k, v) for k, v in record.items() if k not in keys)
+        obj.extra = extra
+        return obj
+
+    @classmethod
+    def from_records(cls, records):
+        """Build the list of the models from the records."""
+        from_dict = cls.from_dict
+        return [from_dict(record) for record in records]
+
+    @classmethod
+    def iter_models(cls, records):
+        """Build the models from the records lazily."""
+        from_dict = cls.from_dict
+        for record in records:
+            yield from_dict(record)
+
+    def to_dict(self):
+        """Return the record as returned by the API."""
+        record = dict(self.extra) if self.extra else {}
+        for attr, key, _ in self.fields:
+            value = getattr(self, attr)
+            if value is not None:
+                record[key] = value
+        return record
+
+    @property
+    def id(self):
+        return self.get(self.key)
+
+    def get(self, key, default=None):
+        """Return the value of the API key, such as "VM_Id", or default."""
+        attr = self._keys().get(key)
+        if attr is not None:
+            value = getattr(self, attr)
+            return default if value is None else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        # The field missing from the record is None, the same as null.
+        attr = self._keys().get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce__(self):
+        values = tuple(getattr(self, attr) for attr, _, _ in self.fields)
+        return _restore, (type(self), values, self.extra)
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(attr, getattr(self, attr))
+            for attr, _, _ in self.fields if getattr(self, attr) is not None))
+
+
+def _restore(cls, values, extra):
+    obj = cls.__new__(cls)
+    for (attr, _, _), value in zip(cls.fields, values):
+        setattr(obj, attr, value)
+    obj.extra = extra
+    return obj
+
+
+def _slots(fields):
+    return tuple(str(attr) for attr, _, _ in fields)
+
+
+class VM(Model):
+    fields = (
+        ("vm_id", "VM_Id", None),
+        ("vm_name", "VM_Name", None),
+        ("status", "Status", None),
+        ("ecu", "ECU", int),
+        ("memory_size", "Memory_Size", int),
+        ("bandwidth", "Bandwidth", int),
+        ("outer_ip", "Outer_Ip", None),
+        ("group_id", "Group_Id", None),
+        ("security_group_id", "Security_Group_Id", None),
+        ("image_id", "Image_Id", None),
+        ("os_version", "OS_Version", None),
+        ("end_time", "End_Time", None),
+    )
+    __slots__ = _slots(fields)
+    key = "VM_Id"
+
+
+class PublicIP(Model):
+    fields = (
+        ("group_id", "Group_Id", None),
+        ("outer_ip", "Outer_Ip", None),
+        ("status", "Status", None),
+        ("bandwidth", "Bandwidth", int),
+        ("vm_name", "VM_Name", None),
+    )
+    __slots__ = _slots(fields)
+    key = "Group_Id"
+
+
+class SecurityGroup(Model):
+    fields = (
+        ("security_group_id", "Security_Group_Id", None),
+        ("security_group_name", "Security_Group_Name", None),
+        ("create_time", "Create_Time", None),
+    )
+    __slots__ = _slots(fields)
+    key = "Security_Group_Id"
+
+
+class Image(Model):
+    fields = (
+        ("image_id", "Image_Id", None),
+        ("image_name", "Image_Name", None),
+        ("image_type", "Image_Type", None),
+        ("image_note", "Image_Note", None),
+        ("status", "Status", None),
+    )
+    __slots__ = _slots(fields)
+    key = "Image_Id"
+
+
+class Project(Model):
+    fields = (
+        ("project_id", "Project_Id", None),
+        ("project_name", "Project_Name", None),
+        ("create_time", "create_time", None),
+    )
+    __slots__ = _slots(fields)
+    key = "Project_Id"
+
+
+class ModelList(object):
+    """ModelList is the read-only list of the models built lazily from the
+    records, such as data["list"] of a select API.
+    """
+
+    def __init__(self, model, records):
+        self._model = model
+        self._records = records
+        self._models = [None] * len(records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        obj = self._models[index]
+        if obj is None:
+            obj = self._models[index] = self._model.from_dict(self._records[index])
+        return obj
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return "ModelList({}, {} records)".format(self._model.__name__, len(self))
+
+
+class RecordBatch(object):
+    """RecordBatch is the columnar view of the records of a model.
+
+    Each field is a column, the numeric fields are stored in the typed arrays,
+    in which the missing values are 0, and the other fields are the lists.
+    """
+
+    def __init__(self, model, columns, length):
+        """Create a new record batch.
+
+        @param model(type): The model, such as VM.
+        @param columns(dict): The columns by the attribute of the field.
+        @param length(int): The number of the records.
+        """
+        self.model = model
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def _build(cls, model, rows):
+        columns = {}
+        length = 0
+        values = dict((attr, []) for attr, _, _ in model.fields)
+        for row in rows:
+            for attr, value in row:
+                values[attr].append(value)
+            length += 1
+
+        for attr, _, type in model.fields:
+            if type is None:
+                columns[attr] = values[attr]
+            else:
+                columns[attr] = array(_TYPECODES[type], (_number(type, v) for v in values[attr]))
+        return cls(model, columns, length)
+
+    @classmethod
+    def from_records(cls, model, records):
+        """Build the batch from the records returned by the API."""
+        fields = [(attr, key) for attr, key, _ in model.fields]
+        return cls._build(model, ([(attr, r.get(key)) for attr, key in fields]
+                                  for r in records))
+
+    @classmethod
+    def from_models(cls, model, models):
+        """Build the batch from the models."""
+        attrs = [attr for attr, _, _ in model.fields]
+        return cls._build(model, ([(attr, getattr(m, attr)) for attr in attrs]
+                                  for m in models))
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """Return the column of the field, such as "bandwidth"."""
+        return self.columns[name]
+
+    def __getitem__(self, index):
+        return self.model(**dict((attr, self.columns[attr][index])
+                                 for attr, _, _ in self.model.fields))
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def take(self, indices):
+        """Return the batch of the records at the indices."""
+        indices = list(indices)
+        columns = {}
+        for name, column in self.columns.items():
+            values = [column[i] for i in indices]
+            columns[name] = array(column.typecode, values) if isinstance(column, array) else values
+        return RecordBatch(self.model, columns, len(indices))
+
+    def filter(self, name, predicate):
+        """Return the batch of the records whose field satisfies the predicate."""
+        column = self.columns[name]
+        return self.take(i for i in range(self._length) if predicate(column[i]))
+
+    def sum(self, name):
+        """Return the sum of the numeric field."""
+        return sum(self.columns[name])
+
+    def group_sum(self, by, name):
+        """Return the dict of the sum of the numeric field by the value of the field by."""
+        sums = {}
+        for key, value in zip(self.columns[by], self.columns[name]):
+            sums[key] = sums.get(key, 0) + value
+        return sums
+
+    def to_records(self):
+        """Return the list of the records as returned by the API."""
+        return [m.to_dict() for m in self]
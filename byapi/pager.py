@@ -0,0 +1,151 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from byapi.deadline import bind_deadline
+
+
+def _has_next(page, offset, page_size):
+    records = page["list"] if page else None
+    if not records or len(records) < page_size:
+        return False
+    count = page.get("count")
+    return count is None or offset + len(records) < int(count)
+
+
+def iter_pages(fetch, page_size=100, prefetch=False):
+    """Yield the pages of a select API one by one.
+
+    @param fetch(callable): The function to fetch a page, which is called as
+                            fetch(offset, limit) and returns a dict with the
+                            keys "count" and "list", such as VMClient.select.
+    @param page_size(int): The number of the records per page.
+    @param prefetch(bool): If true, fetch the next page in the background
+                           while the current page is being consumed.
+
+    @return(generator): The pages.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    offset = 0
+    if not prefetch:
+        while True:
+            page = fetch(offset, page_size)
+            if page:
+                yield page
+            if not _has_next(page, offset, page_size):
+                return
+            offset += len(page["list"])
+
+    from concurrent.futures import ThreadPoolExecutor
+    fetch = bind_deadline(fetch)
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(fetch, offset, page_size)
+    try:
+        while future is not None:
+            page = future.result()
+            if _has_next(page, offset, page_size):
+                offset += len(page["list"])
+                future = executor.submit(fetch, offset, page_size)
+            else:
+                future = None
+
+            if page:
+                yield page
+    finally:
+        if future is not None:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def iter_records(fetch, page_size=100, prefetch=False, stream=False):
+    """Yield the records of a select API one by one, fetching the pages lazily.
+
+    @param stream(bool): If true, fetch returns a StreamedPage, whose records
+                         are yielded while they are received. It can't be used
+                         with prefetch, because the offset of the next page is
+                         only known after the current page is received.
+
+    The rest arguments are the same as iter_pages.
+
+    @return(generator): The records in all the pages.
+    """
+    if not stream:
+        for page in iter_pages(fetch, page_size, prefetch):
+            for record in page["list"]:
+                yield record
+        return
+
+    if prefetch:
+        raise ValueError("prefetch can't be used with stream")
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    offset = 0
+    while True:
+        size = 0
+        with fetch(offset, page_size) as page:
+            for record in page:
+                size += 1
+                yield record
+        count = page.count
+        if size < page_size or (count is not None and offset + size >= int(count)):
+            return
+        offset += size
+
+
+def fetch_all(fetch, page_size=100, max_workers=4, key=None):
+    """Fetch the records in all the pages of a select API concurrently.
+
+    The first page is fetched to get the total count, then the rest pages are
+    fetched concurrently and merged in order. If the records shift between the
+    pages during fetching, the duplicated records are dropped by the key.
+
+    @param fetch(callable): The same as iter_pages.
+    @param page_size(int): The number of the records per page.
+    @param max_workers(int): The maximum number of the concurrent requests.
+    @param key(string): The key of the record ID, such as "VM_Id". If not
+                        given, don't drop the duplicated records.
+
+    @return(list): The records in all the pages.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    first = fetch(0, page_size)
+    if not first or not first["list"]:
+        return []
+
+    # The server may return fewer records than the limit, so the size of the
+    # first page is used as the step of the offsets.
+    step = len(first["list"])
+    count = int(first.get("count") or 0)
+    pages = [first]
+    if count > step:
+        from concurrent.futures import ThreadPoolExecutor
+        fetch = bind_deadline(fetch)
+        offsets = range(step, count, step)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as executor:
+            pages.extend(executor.map(lambda offset: fetch(offset, step), offsets))
+
+    return merge_pages(pages, key)
+
+
+def merge_pages(pages, key=None):
+    """Return the records in the pages in order, in which the duplicated
+    records are dropped by the key if given. See fetch_all.
+    """
+    if key is None:
+        return [record for page in pages if page for record in page["list"]]
+
+    seen = set()
+    records = []
+    for page in pages:
+        for record in (page["list"] if page else ()):
+            rid = record.get(key)
+            if rid is not None:
+                if rid in seen:
+                    continue
+                seen.add(rid)
+            records.append(record)
+    return records
@@ -0,0 +1,86 @@
+# encoding: utf-8
+"""The encoding of the request arguments in the URL or in the POST body.
+
+The arguments are signed before they are encoded, so the encoding doesn't
+change the signature, and the server verifies the same values whichever
+method or body encoding is used.
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import json
+import zlib
+
+from byapi.utils import to_bytes, is_string
+
+try:
+    from urllib.parse import urlencode
+except ImportError:  # Python 2
+    from urllib import urlencode
+
+FORM = "form"
+JSON = "json"
+
+CONTENT_TYPES = {
+    FORM: "application/x-www-form-urlencoded",
+    JSON: "application/json",
+}
+
+# A character is at most 4 bytes in UTF-8, each of which is "%XX" in the URL.
+_MAX_QUOTED = 12
+
+
+def _pairs(data, encoding):
+    return [(to_bytes(k, encoding), to_bytes(v if is_string(v) else "{}".format(v), encoding))
+            for k, v in data.items()]
+
+
+def encode_query(data, encoding="utf-8"):
+    """Return the arguments as the urlencoded string."""
+    return urlencode(_pairs(data, encoding))
+
+
+def is_url_too_long(url, data, limit, encoding="utf-8"):
+    """Return True if the URL of the GET request would be longer than limit.
+
+    The arguments are only urlencoded when the length can't be decided from
+    the length of the raw values.
+    """
+    size = len(url) + 1 + sum(len(k) + len(v if is_string(v) else "{}".format(v)) + 2
+                              for k, v in data.items())
+    if size > limit:
+        return True
+    if size * _MAX_QUOTED <= limit:
+        return False
+    return len(url) + 1 + len(encode_query(data, encoding)) > limit
+
+
+def gzip_compress(data, level=6):
+    """Return the data compressed in the gzip format."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(data) + compressor.flush()
+
+
+def encode_body(data, body_encoding=FORM, encoding="utf-8", gzip_size=None):
+    """Return the POST body and its headers.
+
+    @param data(dict): The normalized and signed arguments.
+    @param body_encoding(string): "form" or "json".
+    @param encoding(string): The charset of the body.
+    @param gzip_size(int): If given, compress the body by gzip when it's not
+                           shorter than gzip_size bytes.
+
+    @return(tuple): (body, headers), the body is bytes.
+    """
+    if body_encoding == JSON:
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    elif body_encoding == FORM:
+        body = encode_query(data, encoding)
+    else:
+        raise ValueError("unknown body encoding {!r}".format(body_encoding))
+
+    body = to_bytes(body, encoding)
+    headers = {"Content-Type": "{}; charset={}".format(CONTENT_TYPES[body_encoding], encoding)}
+    if gzip_size is not None and len(body) >= gzip_size:
+        body = gzip_compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
@@ -0,0 +1,157 @@
+# encoding: utf-8
+"""The process pool to run the very large batches on all the CPU cores.
+
+The normalization, the signature and the JSON decoding of the requests hold
+the GIL, so a batch driven by many threads is bound to one core. ProcessPool
+shards the batch into the chunks across the worker processes, each of which
+holds its own client with the pooled connections, and runs each chunk by the
+threads. The results are streamed back in the order of the items. For example,
+
+    with ProcessPool(VMClient, signature_key, user_id, processes=8) as pool:
+        for r in pool.imap("detail", vmids):
+            print(r.item, r.get())
+
+Notice: with the "spawn" start method, which is the default on Windows and
+macOS, the pool must be created under if __name__ == "__main__", and the
+client class, the client arguments and the transform must be picklable.
+
+To limit the rate of the requests of all the workers, pass a RateLimiter
+whose buckets are created by file_bucket_factory, which reopen the bucket
+file in each worker process. The buckets of the default RateLimiter are
+copied into each worker by "fork", which multiplies the rate, and can't be
+pickled for "spawn".
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import multiprocessing
+
+from byapi.batch import BatchResult, run_batch
+
+# The client and the transform of the current worker process.
+_worker = None
+
+
+def _init_worker(client_class, args, kwargs, transform):
+    global _worker
+    _worker = (client_class(*args, **kwargs), transform)
+
+
+def _run_chunk(task):
+    method, items, args, kwargs, threads = task
+    client, transform = _worker
+    func = getattr(client, method)
+
+    def call(item):
+        result = func(item, *args, **kwargs)
+        return result if transform is None else transform(result)
+
+    if threads > 1:
+        return run_batch(call, items, max_workers=threads)
+
+    results = []
+    for item in items:
+        try:
+            results.append(BatchResult(item, result=call(item)))
+        except Exception as err:
+            results.append(BatchResult(item, exception=err))
+    return results
+
+
+class ProcessPool(object):
+    """ProcessPool runs the batches of a client method across the processes."""
+
+    def __init__(self, client_class, signature_key, user_id, processes=None, threads=4,
+                 chunk_size=32, transform=None, start_method=None, **kwargs):
+        """Create a new process pool.
+
+        @param client_class(type): The client class, such as VMClient.
+        @param signature_key(string): The user signature key.
+        @param user_id(string): The user id.
+        @param processes(int): The number of the worker processes. If not
+                               given, use the number of the CPUs.
+        @param threads(int): The number of the concurrent calls in each worker
+                             process, which overlap the network waits.
+        @param chunk_size(int): The number of the items sent to a worker
+                                process at once.
+        @param transform(callable): If given, the function called with each
+                                    result in the worker process, such as
+                                    VM.from_dict, whose return value is sent
+                                    back instead of the result.
+        @param start_method(string): The start method of the processes, such
+                                     as "fork" or "spawn". If not given, use
+                                     the default of the platform.
+
+        The rest keyword arguments are passed to the client class in each
+        worker process. To limit the rate of the requests of all the workers,
+        pass rate_limiter with the buckets of file_bucket_factory, see the
+        notice of the module.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        kwargs.setdefault("pool_size", threads)
+        self._threads = threads
+        self._chunk_size = chunk_size
+
+        context = multiprocessing
+        if start_method is not None:
+            context = multiprocessing.get_context(start_method)
+        self._pool = context.Pool(processes, initializer=_init_worker,
+                                  initargs=(client_class, (signature_key, user_id),
+                                            kwargs, transform))
+
+    def close(self):
+        """Wait for the pending batches and stop the worker processes."""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """Stop the worker processes at once."""
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def _tasks(self, method, items, args, kwargs):
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= self._chunk_size:
+                yield method, chunk, args, kwargs, self._threads
+                chunk = []
+        if chunk:
+            yield method, chunk, args, kwargs, self._threads
+
+    def imap(self, method, items, *args, **kwargs):
+        """Call the client method with each item in the worker processes, and
+        yield the results in the order of the items as they complete.
+
+        The failure of an item doesn't abort the batch, and its exception is
+        returned in its result instead.
+
+        @param method(string): The name of the client method, such as "detail".
+        @param items(iterable): The items, such as the VM IDs, which are passed
+                                as the first argument of the method.
+
+        The rest arguments are passed to the method, such as project_id.
+
+        @return(generator): The BatchResult of each item.
+        """
+        tasks = self._tasks(method, items, args, kwargs)
+        for results in self._pool.imap(_run_chunk, tasks):
+            for result in results:
+                yield result
+
+    def map(self, method, items, *args, **kwargs):
+        """The same as imap, but wait for all the items.
+
+        @return(list): The list of BatchResult in the order of the items.
+        """
+        return list(self.imap(method, items, *args, **kwargs))
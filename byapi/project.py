@@ -2,16 +2,25 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 from byapi.client import Client
+from byapi.models import Project
 
 
 class ProjectClient(Client):
-    def select(self, offset=None, limit=None, order_by="create_time", order="asc"):
+    # The model of the records, see byapi.models.
+    model = Project
+
+    def select(self, offset=None, limit=None, order_by="create_time", order="asc",
+               stream=False, as_models=False):
         """Get the project lists.
 
         @param offset(string): the offset number.
         @param limit(string): The limit number.
         @param order_by(string): The order field, such as "create_time".
         @param order(string): The order method, such as "asc" or "desc".
+        @param stream(bool): If true, return a StreamedPage, which yields the
+                             records lazily while the response is received.
+        @param as_models(bool): If true, the list is a ModelList, which builds
+                                the models of the records lazily.
 
         @return(dict):
             @key count(int): the total number.
@@ -21,4 +30,26 @@ class ProjectClient(Client):
         self._validate_order(order)
 
         kwargs = self._generate_page_kwargs(order_by, order, offset, limit)
-        return self.request("projectSelect", **kwargs)
+        return self._select("projectSelect", None, stream, as_models, kwargs)
+
+    def iter_select(self, order_by="create_time", order="asc", page_size=100,
+                    prefetch=False, stream=False, as_models=False):
+        """Iterate over the projects in all the pages, which are fetched lazily.
+
+        @param page_size(int): The number of the projects per page.
+        @param prefetch(bool): If true, fetch the next page in the background.
+        @param stream(bool): If true, decode each page lazily while it's received,
+                             which can't be used with prefetch.
+        @param as_models(bool): If true, yield the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(generator): The projects.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(offset=offset, limit=limit, order_by=order_by, order=order,
+                               stream=stream)
+        return self._iter_records(fetch, page_size, prefetch, stream, as_models)
@@ -0,0 +1,235 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from collections import OrderedDict
+from byapi.batch import run_batch
+
+
+class VMSpec(object):
+    """VMSpec is the specification of the VMs to create.
+
+    The arguments are the same as VMClient.create, except that count is the
+    number of the VMs, which is vm_num of VMClient.create.
+    """
+
+    _fields = ("vm_name", "password", "security_group_id", "image_id", "os_type",
+               "cpu", "memory", "bandwidth", "data_disk_size", "count_type",
+               "number", "auto_renew", "application", "note", "shbw_id",
+               "execute_time", "project_id")
+
+    def __init__(self, vm_name, password, security_group_id, image_id, os_type,
+                 cpu=2, memory=4, count=1, bandwidth=None, data_disk_size=None,
+                 count_type="month", number=1, auto_renew=False, application="vm",
+                 note="", shbw_id=None, execute_time=None, project_id=None):
+        self.vm_name = vm_name
+        self.password = password
+        self.security_group_id = security_group_id
+        self.image_id = image_id
+        self.os_type = os_type
+        self.cpu = cpu
+        self.memory = memory
+        self.count = count
+        self.bandwidth = bandwidth
+        self.data_disk_size = data_disk_size
+        self.count_type = count_type
+        self.number = number
+        self.auto_renew = auto_renew
+        self.application = application
+        self.note = note
+        self.shbw_id = shbw_id
+        self.execute_time = execute_time
+        self.project_id = project_id
+
+    def key(self):
+        """Return the key of the spec, and the specs with the same key can be
+        created by one vmAdd."""
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def to_kwargs(self, vm_num):
+        """Return the keyword arguments of VMClient.create."""
+        kwargs = dict((field, getattr(self, field)) for field in self._fields)
+        kwargs["vm_num"] = vm_num
+        return kwargs
+
+    def __repr__(self):
+        return "VMSpec(vm_name={!r}, cpu={!r}, memory={!r}, count={!r})".format(
+            self.vm_name, self.cpu, self.memory, self.count)
+
+
+class ProvisionResult(object):
+    """ProvisionResult is the result of the provisioning.
+
+    @attr vms(dict): The ids of the charging accounts by the created VM IDs,
+                     which is "" if the VM has no public ip.
+    @attr specs(dict): The specs by the created VM IDs.
+    @attr errors(list): The list of (spec, vm_num, exception) of the failed vmAdd.
+    @attr ips(dict): The ids of the charging accounts by the VM IDs, which are
+                     allocated and bound after the VMs are created.
+    @attr ip_errors(list): The list of (vmid, exception) failed to bind the ip.
+    @attr wait_errors(list): The list of (vmids, exception) failed to wait,
+                             such as WaitTimeout, whose VMs have been created.
+    """
+
+    def __init__(self):
+        self.vms = OrderedDict()
+        self.specs = {}
+        self.errors = []
+        self.ips = OrderedDict()
+        self.ip_errors = []
+        self.wait_errors = []
+
+    @property
+    def ok(self):
+        """Return True if nothing failed."""
+        return not self.errors and not self.ip_errors and not self.wait_errors
+
+
+class Provisioner(object):
+    """Provisioner creates many heterogeneous VMs by as few vmAdd as possible.
+
+    The specs are validated locally before any request is sent, then the
+    compatible specs are merged into groups, which are created concurrently.
+    For example,
+
+        specs = [VMSpec("web", passwd, sg_id, image_id, "Linux", count=200),
+                 VMSpec("db", passwd, sg_id, image_id, "Linux", cpu=8, memory=32, count=3)]
+        result = Provisioner(vm_client, ip_client).run(specs, wait=True,
+                                                       ip_options={"bandwidth": 10})
+    """
+
+    def __init__(self, vm_client, ip_client=None, max_workers=8, max_per_call=20):
+        """Create a new provisioner.
+
+        @param vm_client(VMClient): The client to create the VMs.
+        @param ip_client(IPClient): The client to allocate and bind the public
+                                    ips, which is required by ip_options of run.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param max_per_call(int): The maximum number of the VMs per vmAdd.
+        """
+        self._vm_client = vm_client
+        self._ip_client = ip_client
+        self._max_workers = max_workers
+        self._max_per_call = max_per_call
+
+    def validate(self, specs):
+        """Validate all the specs, and raise ValueError listing all the errors."""
+        errors = []
+        for i, spec in enumerate(specs):
+            try:
+                if not spec.vm_name:
+                    raise ValueError("missing the name of VM")
+                if not spec.password:
+                    raise ValueError("missing the password of VM")
+                if spec.count < 1:
+                    raise ValueError("count must be positive")
+                self._vm_client._validate_cpu_memory(spec.cpu, spec.memory)
+                self._vm_client._validate_data_disk(spec.data_disk_size)
+            except ValueError as err:
+                errors.append("spec {} {!r}: {}".format(i, spec, err))
+
+        if errors:
+            raise ValueError("invalid specs:\n" + "\n".join(errors))
+
+    def plan(self, specs):
+        """Merge the compatible specs into the groups.
+
+        @return(list): The list of (spec, vm_num), each of which is a vmAdd.
+        """
+        groups = OrderedDict()
+        for spec in specs:
+            key = spec.key()
+            if key in groups:
+                groups[key][1] += spec.count
+            else:
+                groups[key] = [spec, spec.count]
+
+        calls = []
+        for spec, count in groups.values():
+            while count > 0:
+                vm_num = min(count, self._max_per_call)
+                calls.append((spec, vm_num))
+                count -= vm_num
+        return calls
+
+    def run(self, specs, wait=False, wait_timeout=1800, ip_options=None):
+        """Create the VMs of the specs.
+
+        @param specs(list): The list of VMSpec.
+        @param wait(bool): If true, wait until the created VMs are running.
+        @param wait_timeout(float): The maximum seconds to wait.
+        @param ip_options(dict): If given, allocate a public ip for each created
+                                 VM without the bandwidth, and bind it. They are
+                                 the keyword arguments of IPClient.create, such
+                                 as {"bandwidth": 10, "count_type": "month"}.
+
+        @return(ProvisionResult): The result. A failed vmAdd doesn't abort the
+                                  others, and is recorded in the errors. The
+                                  failures of waiting and binding the ips are
+                                  recorded in the result too, so the created
+                                  VMs are always returned.
+        """
+        specs = list(specs)
+        self.validate(specs)
+        if ip_options is not None and self._ip_client is None:
+            raise ValueError("ip_client is required to bind the public ips")
+
+        calls = self.plan(specs)
+        batch = run_batch(lambda call: self._vm_client.create(**call[0].to_kwargs(call[1])),
+                          calls, max_workers=self._max_workers)
+
+        result = ProvisionResult()
+        for item in batch:
+            spec, vm_num = item.item
+            if not item.ok:
+                result.errors.append((spec, vm_num, item.exception))
+                continue
+            for vmid, group_id in item.result.items():
+                result.vms[vmid] = group_id
+                result.specs[vmid] = spec
+
+        if wait and result.vms:
+            self._wait(result, wait_timeout)
+
+        if ip_options is not None:
+            self._bind_ips(result, ip_options)
+
+        return result
+
+    def _wait(self, result, timeout):
+        # The VMs of the different projects are waited separately.
+        projects = OrderedDict()
+        for vmid, spec in result.specs.items():
+            projects.setdefault(spec.project_id, []).append(vmid)
+
+        for project_id, vmids in projects.items():
+            try:
+                self._vm_client.wait_until_running(vmids, timeout=timeout, project_id=project_id)
+            except Exception as err:
+                result.wait_errors.append((vmids, err))
+
+    def _bind_ips(self, result, ip_options):
+        projects = OrderedDict()
+        for vmid, spec in result.specs.items():
+            if not spec.bandwidth:
+                projects.setdefault(spec.project_id, []).append(vmid)
+
+        for project_id, vmids in projects.items():
+            try:
+                group_ids = self._ip_client.create(num=len(vmids), project_id=project_id,
+                                                   **ip_options)
+            except Exception as err:
+                result.ip_errors.extend((vmid, err) for vmid in vmids)
+                continue
+
+            pairs = list(zip(vmids, group_ids))
+            for vmid in vmids[len(pairs):]:
+                result.ip_errors.append((vmid, RuntimeError("no public ip is allocated")))
+
+            batch = run_batch(lambda pair: self._ip_client.bind(pair[1], pair[0], project_id=project_id),
+                              pairs, max_workers=self._max_workers)
+            for item in batch:
+                vmid, group_id = item.item
+                if item.ok:
+                    result.ips[vmid] = group_id
+                else:
+                    result.ip_errors.append((vmid, item.exception))
@@ -0,0 +1,237 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import os
+import struct
+import time
+
+from threading import Lock
+from byapi.errors import DeadlineExceeded, RateLimitExceeded
+from byapi.utils import monotonic
+
+
+class TokenBucket(object):
+    """TokenBucket is a thread-safe token bucket.
+
+    The tokens are refilled at the rate up to the capacity, and each call
+    consumes one token.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Create a new token bucket.
+
+        @param rate(float): The tokens refilled per second.
+        @param capacity(float): The maximum tokens, that is, the burst size.
+                                If not given, it's the same as rate.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.capacity = max(1, capacity or rate)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def _take(self, tokens, updated, now):
+        """Take a token from the state, and return (tokens, updated, wait),
+        where wait is the seconds to wait if no token is available."""
+        # The clock of a file bucket restarts after the host reboots.
+        tokens = min(self.capacity, tokens + max(0, now - updated) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, now, 0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def try_acquire(self):
+        """Try to consume a token.
+
+        @return(float): 0 if a token is consumed, or the seconds to wait.
+        """
+        with self._lock:
+            self._tokens, self._updated, wait = self._take(self._tokens, self._updated, monotonic())
+            return wait
+
+    def acquire(self, block=True, timeout=None):
+        """Consume a token.
+
+        @param block(bool): If false, return False at once if no token is available.
+        @param timeout(float): The maximum seconds to wait. If not given, wait forever.
+
+        @return(bool): True if a token is consumed.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if not block:
+                return False
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining < wait:
+                    return False
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """FileTokenBucket is a token bucket shared by the processes on one host.
+
+    The state of the bucket is stored in a file, which is locked by flock
+    when being updated, so it works on POSIX only.
+    """
+
+    _format = struct.Struct(str("dd"))
+
+    def __init__(self, path, rate, capacity=None):
+        """Create a new file-backed token bucket.
+
+        @param path(string): The path of the file storing the bucket state,
+                             which is created if missing.
+        """
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    def __getstate__(self):
+        # The lock and the file can't be pickled, and are reopened by the
+        # unpickled bucket, such as in the process of a ProcessPool.
+        return {"path": self.path, "rate": self.rate, "capacity": self.capacity}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["rate"], state["capacity"])
+
+    def _get_fd(self):
+        # The forked processes share the open file description of the parent,
+        # on which flock doesn't exclude each other, so the file is opened
+        # again in each process.
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = pid
+        return self._fd
+
+    def try_acquire(self):
+        import fcntl
+
+        with self._lock:
+            fd = self._get_fd()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                now = monotonic()
+                data = os.pread(fd, self._format.size, 0)
+                if len(data) == self._format.size:
+                    tokens, updated = self._format.unpack(data)
+                else:
+                    tokens, updated = self.capacity, now
+
+                tokens, updated, wait = self._take(tokens, updated, now)
+                os.pwrite(fd, self._format.pack(tokens, updated), 0)
+                return wait
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = self._pid = None
+
+
+def file_bucket_factory(directory):
+    """Return a bucket factory of RateLimiter, which creates the buckets
+    shared by the processes in the directory."""
+
+    def factory(name, rate, capacity):
+        return FileTokenBucket(os.path.join(directory, name + ".bucket"), rate, capacity)
+    return factory
+
+
+class RateLimiter(object):
+    """RateLimiter limits the rate of the requests on the client side.
+
+    It has a global bucket for all the requests and the optional buckets for
+    the actions, and a request must acquire the tokens from both of them.
+    The limiter can be shared by the clients of an account, see get_rate_limiter.
+    """
+
+    def __init__(self, rate=None, burst=None, action_rates=None, block=True,
+                 timeout=None, bucket_factory=None, name="global"):
+        """Create a new rate limiter.
+
+        @param rate(float): The maximum requests per second. If not given,
+                            don't limit the total rate.
+        @param burst(float): The maximum requests in a burst. If not given,
+                             it's the same as rate.
+        @param action_rates(dict): The maximum requests per second of the
+                                   actions, such as {"vmAdd": 1}. The value
+                                   may be a tuple (rate, burst).
+        @param block(bool): If true, wait for the tokens. Or raise the
+                            RateLimitExceeded at once if no token is available.
+        @param timeout(float): The maximum seconds to wait for the tokens,
+                               then raise the RateLimitExceeded.
+        @param bucket_factory(callable): The function to create the bucket,
+                                         as factory(name, rate, burst). If not
+                                         given, use the thread-safe buckets in
+                                         the process. See file_bucket_factory.
+        @param name(string): The name prefix of the buckets.
+        """
+        factory = bucket_factory or (lambda name, rate, capacity: TokenBucket(rate, capacity))
+
+        self._block = block
+        self._timeout = timeout
+        self._bucket = factory(name, rate, burst) if rate else None
+        self._action_buckets = {}
+        for action, action_rate in (action_rates or {}).items():
+            action_rate, action_burst = (action_rate if isinstance(action_rate, (tuple, list))
+                                         else (action_rate, None))
+            self._action_buckets[action] = factory("{}-{}".format(name, action),
+                                                   action_rate, action_burst)
+
+    def acquire(self, action, deadline=None):
+        """Acquire the tokens to send a request of the action.
+
+        @param action(string): The API name, such as vmAdd.
+        @param deadline(Deadline): The deadline of the call, which caps the
+                                   time to wait for the tokens. If it's
+                                   reached, raise the DeadlineExceeded.
+        """
+        for bucket in (self._bucket, self._action_buckets.get(action)):
+            if bucket is None:
+                continue
+
+            timeout, capped = self._timeout, False
+            if deadline is not None:
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    raise DeadlineExceeded("the deadline has expired")
+                if timeout is None or remaining < timeout:
+                    timeout, capped = remaining, True
+
+            if not bucket.acquire(self._block, timeout):
+                if capped:
+                    raise DeadlineExceeded("the deadline expires before the rate limit of {} "
+                                           "allows the request".format(action))
+                raise RateLimitExceeded("the rate limit of {} is exceeded".format(action))
+
+
+_limiters = {}
+_limiters_lock = Lock()
+
+
+def get_rate_limiter(user_id, **kwargs):
+    """Return the rate limiter shared by the clients of the user.
+
+    The limiter is created with the keyword arguments of RateLimiter for the
+    first time, and the arguments are ignored later.
+
+    @param user_id(string): The user id.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(user_id)
+        if limiter is None:
+            kwargs.setdefault("name", "user-{}".format(user_id))
+            limiter = _limiters[user_id] = RateLimiter(**kwargs)
+        return limiter
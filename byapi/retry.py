@@ -0,0 +1,100 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import random
+
+from threading import Lock
+from byapi.cache import READ_ACTIONS
+from byapi.errors import APIError
+
+
+class RetryBudget(object):
+    """RetryBudget limits the retries to a ratio of the requests.
+
+    Each successful request deposits ratio tokens, and each retry withdraws
+    one token, so that the retries can't multiply the load when the API is
+    down. It starts with the full tokens to allow the retries at the startup.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        """Create a new retry budget.
+
+        @param ratio(float): The tokens deposited by each successful request.
+        @param max_tokens(float): The maximum number of the tokens.
+        """
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self):
+        """Return True if a retry is allowed, and consume a token."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """RetryPolicy decides which failed requests to retry and when.
+
+    Only the read actions and the actions marked safe are retried, because
+    retrying a mutating action, such as vmAdd, may apply it twice.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=5,
+                 retry_codes=(429, 500, 502, 503, 504), safe_actions=(),
+                 budget_ratio=0.1, budget_tokens=10):
+        """Create a new retry policy.
+
+        @param max_attempts(int): The maximum number of the attempts, including
+                                  the first one.
+        @param backoff(float): The base seconds of the exponential backoff.
+        @param max_backoff(float): The maximum seconds of the backoff.
+        @param retry_codes(tuple): The retryable API error or HTTP status codes.
+        @param safe_actions(tuple): The mutating actions which are safe to retry.
+        @param budget_ratio(float): The retry tokens earned by each successful
+                                    request of a client.
+        @param budget_tokens(float): The maximum retry tokens of a client.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_codes = frozenset(retry_codes)
+        self.safe_actions = frozenset(safe_actions)
+        self.budget_ratio = budget_ratio
+        self.budget_tokens = budget_tokens
+
+    def new_budget(self):
+        """Return a new retry budget for a client."""
+        return RetryBudget(self.budget_ratio, self.budget_tokens)
+
+    def is_retryable_action(self, action):
+        return action in READ_ACTIONS or action in self.safe_actions
+
+    def is_retryable_error(self, err, transport_errors=()):
+        """Return True if the error is transient.
+
+        @param err(Exception): The error of the request.
+        @param transport_errors(tuple): The exception types of the transport
+                                        which are transient, such as the
+                                        connection reset.
+        """
+        if isinstance(err, APIError):
+            return err.code in self.retry_codes
+        return isinstance(err, tuple(transport_errors))
+
+    def get_backoff(self, attempt):
+        """Return the seconds to sleep before the retry, with the full jitter.
+
+        @param attempt(int): The number of the failed attempts, from 1.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
@@ -2,25 +2,29 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 from byapi.client import Client
+from byapi.models import SecurityGroup
 
 
 class SGClient(Client):
+    # The model of the records, see byapi.models.
+    model = SecurityGroup
+
     def create(self, name, project_id=None):
         """Create a new Security Group.
 
         @param name(string): The name of SG.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
             "Security_Group_Name": name
         }
-        self.request("securityAdd", project_id=project_id, **kwargs)
+        return self.request("securityAdd", project_id=project_id, **kwargs)
 
     def select(self, name=None, offset=None, limit=None, order_by="Create_Time",
-               order="asc", project_id=None):
+               order="asc", project_id=None, stream=False, as_models=False):
         """Query the information of the security group.
 
         @param name(string): The name of SG.
@@ -29,6 +33,10 @@ class SGClient(Client):
         @param order_by(string): The order field, such as "Create_Time".
         @param order(string): The order method, such as "asc" or "desc".
         @param project_id(string): The project id. If not given, use the default.
+        @param stream(bool): If true, return a StreamedPage, which yields the
+                             records lazily while the response is received.
+        @param as_models(bool): If true, the list is a ModelList, which builds
+                                the models of the records lazily.
 
         @return(dict):
             @key count(int): the total number.
@@ -40,7 +48,51 @@ class SGClient(Client):
         kwargs = self._generate_page_kwargs(order_by, order, offset, limit)
         if name:
             kwargs["Security_Group_Name"] = name
-        return self.request("securitySelect", project_id=project_id, **kwargs)
+        return self._select("securitySelect", project_id, stream, as_models, kwargs)
+
+    def iter_select(self, name=None, order_by="Create_Time", order="asc",
+                    project_id=None, page_size=100, prefetch=False, stream=False,
+                    as_models=False):
+        """Iterate over the security groups in all the pages, which are fetched lazily.
+
+        @param page_size(int): The number of the SGs per page.
+        @param prefetch(bool): If true, fetch the next page in the background.
+        @param stream(bool): If true, decode each page lazily while it's received,
+                             which can't be used with prefetch.
+        @param as_models(bool): If true, yield the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(generator): The security groups.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(name=name, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id,
+                               stream=stream)
+        return self._iter_records(fetch, page_size, prefetch, stream, as_models)
+
+    def select_all(self, name=None, order_by="Create_Time", order="asc",
+                   project_id=None, page_size=100, max_workers=4, as_models=False):
+        """Query the security groups in all the pages, which are fetched concurrently.
+
+        @param page_size(int): The number of the SGs per page.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param as_models(bool): If true, return the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(list): The SG list, in which the duplicated SGs are dropped.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(name=name, offset=offset, limit=limit,
+                               order_by=order_by, order=order, project_id=project_id)
+        return self._fetch_all(fetch, page_size, max_workers, "Security_Group_Id", as_models)
 
     def delete(self, sg_id, project_id=None):
         """Delete the security group by the ID.
@@ -48,10 +100,10 @@ class SGClient(Client):
         @param sg_id(string): The SG ID.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
-        self.request("securityDel", project_id=project_id, Security_Group_Id=sg_id)
+        return self.request("securityDel", project_id=project_id, Security_Group_Id=sg_id)
 
     def bind(self, sg_id, vmid, project_id=None):
         """Bind the security rules of VM to a certain security group.
@@ -60,11 +112,11 @@ class SGClient(Client):
         @param vmid(string): The VM ID.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
             "Security_Group_Id": sg_id,
             "VM_Id": vmid,
         }
-        self.request("securityBind", project_id=project_id, **kwargs)
+        return self.request("securityBind", project_id=project_id, **kwargs)
@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from bisect import bisect_left
+from hashlib import md5
+from byapi.utils import to_bytes
+
+
+class Signer(object):
+    """Signer computes the signatures of the requests.
+
+    The signature is the MD5 of the sorted "keyvalue" pairs of the arguments
+    followed by the signature key. The fixed arguments, such as Local_Id,
+    User_Id and Project_Id, are the same in every request, so they are
+    formatted once and the MD5 states of their sorted prefixes are cached.
+    Only the arguments of each call are sorted and merged into them.
+    """
+
+    def __init__(self, signature_key, fixed):
+        """Create a new signer.
+
+        @param signature_key(string): The user signature key.
+        @param fixed(dict): The normalized arguments which are the same in
+                            every request, such as Local_Id.
+        """
+        self._key = "{0}".format(signature_key)
+        self._fixed_keys = sorted(k for k, v in fixed.items() if v is not None)
+        self._fixed_set = frozenset(self._fixed_keys)
+        self._fixed_items = ["{0}{1}".format(k, fixed[k]) for k in self._fixed_keys]
+
+        # self._states[i] is the MD5 state after the first i fixed pairs.
+        state = md5()
+        self._states = [state]
+        for item in self._fixed_items:
+            state = state.copy()
+            state.update(to_bytes(item))
+            self._states.append(state)
+
+    def sign(self, params):
+        """Return the signature of the request arguments.
+
+        @param params(dict): The normalized arguments of the request, which
+                             contain the fixed arguments of the signer.
+
+        @return(string): The signature.
+        """
+        fixed_keys, fixed_items = self._fixed_keys, self._fixed_items
+        keys = sorted(k for k in params if k not in self._fixed_set)
+
+        i = bisect_left(fixed_keys, keys[0]) if keys else len(fixed_keys)
+        state = self._states[i].copy()
+
+        parts = []
+        for key in keys:
+            while i < len(fixed_keys) and fixed_keys[i] < key:
+                parts.append(fixed_items[i])
+                i += 1
+            parts.append("{0}{1}".format(key, params[key]))
+        parts.extend(fixed_items[i:])
+        parts.append(self._key)
+
+        state.update(to_bytes("".join(parts)))
+        return state.hexdigest()
+
+    def sign_many(self, params_list):
+        """Return the signatures of many requests.
+
+        @param params_list(list): The list of the arguments of the requests.
+
+        @return(list): The signatures in the same order.
+        """
+        sign = self.sign
+        return [sign(params) for params in params_list]
@@ -0,0 +1,59 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+from threading import Event, Lock
+from byapi.deadline import current_deadline
+from byapi.errors import DeadlineExceeded
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """SingleFlight collapses the concurrent identical calls into one.
+
+    While a call with a key is in flight, the other callers with the same key
+    wait for it and share its result or exception instead of calling again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key, func):
+        """Call func, or wait for the in-flight call with the same key.
+
+        @param key: The hashable key of the call.
+        @param func(callable): The function to call without the arguments.
+
+        @return: The result of func.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # Wait no longer than the deadline of the caller, not the leader.
+            d = current_deadline()
+            if not call.event.wait(None if d is None else max(0, d.remaining())):
+                raise DeadlineExceeded("the deadline has expired")
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as err:
+            call.exception = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
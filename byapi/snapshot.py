@@ -0,0 +1,202 @@
+# encoding: utf-8
+"""The on-disk snapshot of the inventory of a project.
+
+The snapshot file has the layout:
+
+    magic(8 bytes) | header size(uint64, little endian) | header | sections
+
+The header is a JSON object with the project id, the creation time and the
+offset, the size, the columns and the sync time of each section. Each kind of
+the resources is a section, which stores the records by columns, that is, the
+list of the values of each field, as the zlib-compressed JSON.
+
+The file is read by mmap, and a section is only decoded when it's accessed,
+so a tool can load the snapshot to start with a warm inventory fast, for
+example,
+
+    inventory = Inventory(vm_client=vm_client, ip_client=ip_client)
+    if os.path.exists(path):
+        with Snapshot(path) as snapshot:
+            inventory.restore(snapshot)
+    inventory.sync()  # Only the stale kinds are synced.
+    write_snapshot(path, inventory)
+"""
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+from byapi.utils import to_bytes, to_unicode
+
+MAGIC = b"BYSNAP1\n"
+_SIZE = struct.Struct(str("<Q"))
+
+
+def _encode_section(records):
+    columns = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+
+    data = [[record.get(column) for record in records] for column in columns]
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return columns, zlib.compress(to_bytes(payload))
+
+
+class Snapshot(object):
+    """Snapshot is the read-only view of a snapshot file."""
+
+    def __init__(self, path):
+        """Open the snapshot file.
+
+        @param path(string): The path of the snapshot file.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        prefix = len(MAGIC) + _SIZE.size
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("{} is not a snapshot file".format(path))
+
+        size = _SIZE.unpack(self._mmap[len(MAGIC):prefix])[0]
+        self._header = json.loads(to_unicode(self._mmap[prefix:prefix + size]))
+        self._base = prefix + size
+        self._columns = {}
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def project_id(self):
+        return self._header["project_id"]
+
+    @property
+    def created_at(self):
+        """Return the timestamp when the snapshot was written."""
+        return self._header["created_at"]
+
+    @property
+    def kinds(self):
+        """Return the kinds of the resources in the snapshot."""
+        return list(self._header["sections"])
+
+    def synced_at(self, kind):
+        """Return the timestamp of the last full sync of the kind."""
+        return self._header["sections"][kind]["synced_at"]
+
+    def age(self, kind=None):
+        """Return the seconds since the kind, or the oldest kind, was synced."""
+        kinds = [kind] if kind else self.kinds
+        synced = [self.synced_at(k) or 0 for k in kinds]
+        return time.time() - min(synced) if synced else float("inf")
+
+    def is_stale(self, max_age, kind=None):
+        """Return True if the kind, or any kind, is older than max_age seconds."""
+        return self.age(kind) > max_age
+
+    def _raw(self, kind):
+        section = self._header["sections"][kind]
+        start = self._base + section["offset"]
+        return self._mmap[start:start + section["size"]]
+
+    def columns(self, kind):
+        """Return the columns of the kind as a dict of the field and its values."""
+        columns = self._columns.get(kind)
+        if columns is None:
+            names = self._header["sections"][kind]["columns"]
+            data = json.loads(to_unicode(zlib.decompress(self._raw(kind))))
+            columns = self._columns[kind] = dict(zip(names, data))
+        return columns
+
+    def records(self, kind):
+        """Return the list of the records of the kind."""
+        columns = self.columns(kind)
+        names = self._header["sections"][kind]["columns"]
+        records = []
+        for i in range(self._header["sections"][kind]["count"]):
+            records.append(dict((name, columns[name][i]) for name in names
+                                if columns[name][i] is not None))
+        return records
+
+
+def write_snapshot(path, inventory, kinds=None):
+    """Write the inventory to the snapshot file atomically.
+
+    @param path(string): The path of the snapshot file.
+    @param inventory(Inventory): The inventory to write.
+    @param kinds(list): The kinds to write. If given and the file exists, the
+                        other kinds are kept from the file, which refreshes
+                        the snapshot partially.
+    """
+    sections = []  # [(kind, meta, raw)]
+    old = None
+    if kinds is not None and os.path.exists(path):
+        old = Snapshot(path)
+        if "{}".format(old.project_id) != "{}".format(inventory.project_id):
+            old.close()
+            raise ValueError("the snapshot is of another project")
+
+    # The kinds only in the old snapshot are kept as well.
+    current = inventory.kinds
+    all_kinds = current + ([kind for kind in old.kinds if kind not in current]
+                           if old is not None else [])
+
+    try:
+        for kind in all_kinds:
+            if kind in current and (kinds is None or kind in kinds):
+                records = inventory.records(kind)
+                columns, raw = _encode_section(records)
+                meta = {"columns": columns, "count": len(records),
+                        "synced_at": inventory.synced_at(kind)}
+            elif old is not None and kind in old.kinds:
+                meta = dict(old._header["sections"][kind])
+                raw = old._raw(kind)
+            else:
+                continue
+            sections.append((kind, meta, raw))
+    finally:
+        if old is not None:
+            old.close()
+
+    offset = 0
+    header = {"version": 1, "project_id": inventory.project_id,
+              "created_at": time.time(), "sections": {}}
+    for kind, meta, raw in sections:
+        meta.update(offset=offset, size=len(raw))
+        header["sections"][kind] = meta
+        offset += len(raw)
+    header = to_bytes(json.dumps(header, separators=(",", ":")))
+
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(_SIZE.pack(len(header)))
+            f.write(header)
+            for _, _, raw in sections:
+                f.write(raw)
+        os.rename(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,91 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+
+class Transport(object):
+    """Transport is the interface that sends the HTTP requests of the API.
+
+    A client owns a transport and delegates all the network I/O to it, so the
+    transport can be replaced, for example, to share the connection pool
+    between several clients.
+
+    @attr retryable_errors(tuple): The exception types which are transient,
+                                   such as the connection reset.
+    """
+
+    retryable_errors = ()
+
+    def send(self, url, data, timeout=None, method="GET", headers=None, stream=False):
+        """Send the request and return the response.
+
+        @param url(string): The full url of the API, such as ".../v1/vmSelect".
+        @param data(dict, bytes): The normalized and signed request arguments
+                                  for GET, or the encoded body for POST.
+        @param timeout(float, tuple): The seconds to wait for the server, or a
+                                      tuple (connect, read). None is forever.
+        @param method(string): "GET" or "POST". The client only passes the
+                               method and the headers for POST.
+        @param headers(dict): The extra HTTP headers, such as Content-Type.
+        @param stream(bool): If true, return before the body is read, and the
+                             response must support iter_content(chunk_size)
+                             and close(). The client only passes it if true.
+
+        @return(requests.Response): The HTTP response.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources, such as the pooled connections."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SessionTransport(Transport):
+    """SessionTransport sends the requests by a persistent requests.Session.
+
+    The connections to the API host are kept alive and reused by the later
+    requests, which avoids the TCP connection and TLS handshake per call.
+    """
+
+    def __init__(self, pool_connections=1, pool_maxsize=10, pool_block=False,
+                 keep_alive=True):
+        """Create a new session transport.
+
+        @param pool_connections(int): The number of the hosts to cache the pool.
+        @param pool_maxsize(int): The maximum number of the connections to
+                                  keep alive in the pool for each host, which
+                                  should be not less than the number of the
+                                  threads sharing the client.
+        @param pool_block(bool): If true, wait for a free connection when the
+                                 pool is exhausted, instead of opening a new
+                                 connection which won't be kept in the pool.
+        @param keep_alive(bool): If false, close the connection after each request.
+        """
+        # requests is imported here, since it's the most of the import time.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.retryable_errors = (requests.ConnectionError, requests.Timeout)
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block,
+                              max_retries=0)
+
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+    def send(self, url, data, timeout=None, method="GET", headers=None, stream=False):
+        if method == "GET":
+            return self._session.get(url, params=data, headers=headers, timeout=timeout,
+                                     stream=stream)
+        return self._session.request(method, url, data=data, headers=headers, timeout=timeout,
+                                     stream=stream)
+
+    def close(self):
+        self._session.close()
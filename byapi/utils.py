@@ -2,6 +2,7 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 import sys
+import time
 
 
 if sys.version_info[0] == 2:
@@ -16,6 +17,7 @@ is_string = lambda s: True if isinstance(s, (Byte, Unicode)) else False
 to_unicode = lambda s, e="utf-8": s if isinstance(s, Unicode) else s.decode(e)
 to_bytes = lambda s, e="utf-8": s if isinstance(s, Byte) else s.encode(e)
 to_str = to_bytes if PY2 else to_unicode
+monotonic = getattr(time, "monotonic", time.time)
 
 
 def datetime2str(dt):
@@ -2,10 +2,24 @@
 from __future__ import print_function, unicode_literals, absolute_import, division
 
 from byapi.client import Client
+from byapi.errors import APIError
+from byapi.models import VM
 from byapi.utils import datetime2str
+from byapi.waiter import Waiter
 
 
 class VMClient(Client):
+    # The model of the records, see byapi.models.
+    model = VM
+
+    # The key and the values of the VM status in the VM information.
+    status_key = "Status"
+    status_running = "running"
+    status_stopped = "stopped"
+
+    # The API error codes of vmDetail if the VM doesn't exist.
+    not_found_codes = (404,)
+
     def create(self, vm_name, password, security_group_id, image_id, os_type,
                cpu=2, memory=4, vm_num=1, bandwidth=None, data_disk_size=None,
                count_type="month", number=1, auto_renew=False, application="vm",
@@ -73,6 +87,9 @@ class VMClient(Client):
             kwargs["Execute_Time"] = datetime2str(execute_time)
 
         data = self.request("vmAdd", project_id=project_id, **kwargs)
+        return self._then(data, self._parse_vg_ids)
+
+    def _parse_vg_ids(self, data):
         results = {}
         vms = [vm for vm in data["VG_Id"].strip().split(",") if vm]
         for vm in vms:
@@ -81,7 +98,8 @@ class VMClient(Client):
         return results
 
     def select(self, outer_ip=None, vm_name=None, offset=None, limit=None,
-               order_by="NAME", order="asc", project_id=None):
+               order_by="NAME", order="asc", project_id=None, stream=False,
+               as_models=False):
         """Query the information of the VM.
 
         @param outer_ip(string): The outer public ip.
@@ -91,6 +109,10 @@ class VMClient(Client):
         @param order_by(string): The order field, such as "NAME", "Outer_Ip", etc.
         @param order(string): The order method, such as "asc" or "desc".
         @param project_id(string): The project id. If not given, use the default.
+        @param stream(bool): If true, return a StreamedPage, which yields the
+                             records lazily while the response is received.
+        @param as_models(bool): If true, the list is a ModelList, which builds
+                                the models of the records lazily.
 
         @return(dict):
             @key count(int): the total number.
@@ -107,7 +129,52 @@ class VMClient(Client):
             kwargs["Outer_Ip"] = outer_ip
         if vm_name:
             kwargs["VM_Name"] = vm_name
-        return self.request("vmSelect", project_id=project_id, **kwargs)
+        return self._select("vmSelect", project_id, stream, as_models, kwargs)
+
+    def iter_select(self, outer_ip=None, vm_name=None, order_by="NAME", order="asc",
+                    project_id=None, page_size=100, prefetch=False, stream=False,
+                    as_models=False):
+        """Iterate over the VMs in all the pages, which are fetched lazily.
+
+        @param page_size(int): The number of the VMs per page.
+        @param prefetch(bool): If true, fetch the next page in the background.
+        @param stream(bool): If true, decode each page lazily while it's received,
+                             which can't be used with prefetch.
+        @param as_models(bool): If true, yield the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(generator): The VMs.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(outer_ip=outer_ip, vm_name=vm_name, offset=offset,
+                               limit=limit, order_by=order_by, order=order,
+                               project_id=project_id, stream=stream)
+        return self._iter_records(fetch, page_size, prefetch, stream, as_models)
+
+    def select_all(self, outer_ip=None, vm_name=None, order_by="NAME", order="asc",
+                   project_id=None, page_size=100, max_workers=4, as_models=False):
+        """Query the VMs in all the pages, which are fetched concurrently.
+
+        @param page_size(int): The number of the VMs per page.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param as_models(bool): If true, return the models instead of the dicts.
+
+        The rest arguments are the same as select.
+
+        @return(list): The VM list, in which the duplicated VMs are dropped.
+        """
+
+        self._validate_order(order)
+
+        def fetch(offset, limit):
+            return self.select(outer_ip=outer_ip, vm_name=vm_name, offset=offset,
+                               limit=limit, order_by=order_by, order=order,
+                               project_id=project_id)
+        return self._fetch_all(fetch, page_size, max_workers, "VM_Id", as_models)
 
     def update(self, vmid, cpu, memory, data_disk_size=None, hot=False,
                project_id=None):
@@ -120,7 +187,7 @@ class VMClient(Client):
         @param hot(bool): If true, execute the hot upgrade. Or the VM must be shutdowned.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         kwargs = {
@@ -133,7 +200,7 @@ class VMClient(Client):
         if data_disk_size is not None:
             kwargs["Data_Disk_Size"] = data_disk_size
 
-        self.request("vmUpdate", project_id=project_id, **kwargs)
+        return self.request("vmUpdate", project_id=project_id, **kwargs)
 
     def change_status(self, vmid, status, project_id=None):
         """Change the status of VM.
@@ -142,7 +209,7 @@ class VMClient(Client):
         @param status(string): the status action, such as start, down, restart.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
         if status not in ("start", "down", "restart"):
@@ -152,7 +219,7 @@ class VMClient(Client):
             "VM_Id": vmid,
             "Status": status,
         }
-        self.request("vmChangeStatus", project_id=project_id, **kwargs)
+        return self.request("vmChangeStatus", project_id=project_id, **kwargs)
 
     def detail(self, vmid, project_id=None):
         """Query the detail information of the VM by ID.
@@ -171,10 +238,10 @@ class VMClient(Client):
         @param vmid(string): The VM ID.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None.
+        @return: The API data, or a coroutine in the async clients.
         """
 
-        self.request("vmPowerDown", project_id=project_id, VM_Id=vmid)
+        return self.request("vmPowerDown", project_id=project_id, VM_Id=vmid)
 
     def check_name(self, name, project_id=None):
         """Check whether the VM name is valid.
@@ -182,10 +249,11 @@ class VMClient(Client):
         @param name(string): The name of SG.
         @param project_id(string): The project id. If not given, use the default.
 
-        @return: None. If the name is invalid, raise an exception with an reason.
+        @return: The API data, or a coroutine in the async clients. If the
+                 name is invalid, raise an exception with an reason.
         """
 
-        self.request("vmCheckName", project_id=project_id, VM_Name=name)
+        return self.request("vmCheckName", project_id=project_id, VM_Name=name)
 
     def delete(self, vmid, project_id=None):
         """Delete the VM.
@@ -193,7 +261,160 @@ class VMClient(Client):
         @param vmid(string): The VM ID.
         @param project_id(string): The project id. If not given, use the default.
 
+        @return: The API data, or a coroutine in the async clients.
+        """
+
+        return self.request("vmDel", project_id=project_id, VM_Id=vmid)
+
+    def batch_update(self, vmids, cpu, memory, data_disk_size=None, hot=False,
+                     project_id=None, max_workers=8, rate=None):
+        """Update the configuration of the VMs concurrently.
+
+        @param vmids(list): The VM IDs.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param rate(float): The maximum number of the requests per second.
+                            If not given, don't limit the rate.
+
+        The rest arguments are the same as update.
+
+        @return(list): The list of BatchResult in the order of vmids, each of
+                       which has either the result or the exception.
+        """
+
+        self._validate_cpu_memory(cpu, memory)
+        self._validate_data_disk(data_disk_size)
+
+        return self._batch(self.update, vmids, max_workers, rate, cpu, memory,
+                           data_disk_size=data_disk_size, hot=hot,
+                           project_id=project_id)
+
+    def batch_change_status(self, vmids, status, project_id=None, max_workers=8,
+                            rate=None):
+        """Change the status of the VMs concurrently.
+
+        @param vmids(list): The VM IDs.
+        @param status(string): the status action, such as start, down, restart.
+        @param project_id(string): The project id. If not given, use the default.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param rate(float): The maximum number of the requests per second.
+                            If not given, don't limit the rate.
+
+        @return(list): The list of BatchResult in the order of vmids.
+        """
+
+        if status not in ("start", "down", "restart"):
+            raise ValueError("status must be one of start, down and restart")
+
+        return self._batch(self.change_status, vmids, max_workers, rate, status,
+                           project_id=project_id)
+
+    def batch_detail(self, vmids, project_id=None, max_workers=8, rate=None):
+        """Query the detail information of the VMs concurrently.
+
+        @param vmids(list): The VM IDs.
+        @param project_id(string): The project id. If not given, use the default.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param rate(float): The maximum number of the requests per second.
+                            If not given, don't limit the rate.
+
+        @return(list): The list of BatchResult in the order of vmids, the result
+                       of which is the VM information.
+        """
+
+        return self._batch(self.detail, vmids, max_workers, rate, project_id=project_id)
+
+    def batch_power_down(self, vmids, project_id=None, max_workers=8, rate=None):
+        """Power off the VMs concurrently.
+
+        @param vmids(list): The VM IDs.
+        @param project_id(string): The project id. If not given, use the default.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param rate(float): The maximum number of the requests per second.
+                            If not given, don't limit the rate.
+
+        @return(list): The list of BatchResult in the order of vmids.
+        """
+
+        return self._batch(self.power_down, vmids, max_workers, rate, project_id=project_id)
+
+    def batch_delete(self, vmids, project_id=None, max_workers=8, rate=None):
+        """Delete the VMs concurrently.
+
+        @param vmids(list): The VM IDs.
+        @param project_id(string): The project id. If not given, use the default.
+        @param max_workers(int): The maximum number of the concurrent requests.
+        @param rate(float): The maximum number of the requests per second.
+                            If not given, don't limit the rate.
+
+        @return(list): The list of BatchResult in the order of vmids.
+        """
+
+        return self._batch(self.delete, vmids, max_workers, rate, project_id=project_id)
+
+    def _detail_or_none(self, vmid, project_id=None):
+        try:
+            return self.detail(vmid, project_id=project_id)
+        except APIError as err:
+            if err.code in self.not_found_codes:
+                return None
+            raise
+
+    def _new_waiter(self, predicate, timeout, delay, max_delay, page_size, project_id):
+        def fetch():
+            return self.iter_select(page_size=page_size, project_id=project_id)
+
+        def detail(vmid):
+            return self._detail_or_none(vmid, project_id)
+
+        return Waiter(fetch, "VM_Id", predicate, delay=delay, max_delay=max_delay,
+                      timeout=timeout, detail=detail, page_size=page_size)
+
+    def wait_for_status(self, vmids, status, timeout=600, delay=1, max_delay=30,
+                        page_size=100, project_id=None):
+        """Wait until all the VMs reach the status.
+
+        The VMs are checked together by walking the pages of vmSelect instead
+        of calling vmDetail for each VM, unless there are fewer pending VMs
+        than the pages, and the interval between the polls grows while no VM
+        makes progress.
+
+        @param vmids(list): The VM IDs.
+        @param status(string): The target status, such as VMClient.status_running.
+        @param timeout(float): The maximum seconds to wait.
+        @param delay(float): The initial seconds between the polls.
+        @param max_delay(float): The maximum seconds between the polls.
+        @param page_size(int): The number of the VMs per page of vmSelect.
+        @param project_id(string): The project id. If not given, use the default.
+
+        @return(dict): The VM information by the VM IDs. If timeout, raise
+                       WaitTimeout with the pending VM IDs.
+        """
+
+        def predicate(vm):
+            return vm is not None and vm.get(self.status_key) == status
+
+        waiter = self._new_waiter(predicate, timeout, delay, max_delay, page_size, project_id)
+        return self._wait(waiter, vmids)
+
+    def wait_until_running(self, vmids, **kwargs):
+        """Wait until all the VMs are running. See wait_for_status."""
+
+        return self.wait_for_status(vmids, self.status_running, **kwargs)
+
+    def wait_until_stopped(self, vmids, **kwargs):
+        """Wait until all the VMs are stopped. See wait_for_status."""
+
+        return self.wait_for_status(vmids, self.status_stopped, **kwargs)
+
+    def wait_until_deleted(self, vmids, timeout=600, delay=1, max_delay=30,
+                           page_size=100, project_id=None):
+        """Wait until all the VMs disappear. See wait_for_status.
+
+        A VM is missing if vmDetail fails with one of not_found_codes.
+
         @return: None.
         """
 
-        self.request("vmDel", project_id=project_id, VM_Id=vmid)
+        waiter = self._new_waiter(lambda vm: vm is None, timeout, delay, max_delay,
+                                  page_size, project_id)
+        self._wait(waiter, vmids)
@@ -0,0 +1,150 @@
+# encoding: utf-8
+from __future__ import print_function, unicode_literals, absolute_import, division
+
+import time
+
+from byapi.batch import run_batch
+from byapi.deadline import current_deadline
+from byapi.errors import WaitFailed, WaitTimeout
+from byapi.utils import monotonic
+
+
+class Waiter(object):
+    """Waiter polls the resources until all of them reach the target state.
+
+    All the pending resources are checked together by walking the pages of a
+    select API once per poll, which stops as soon as all of them are found.
+    If the function to fetch a resource by ID is given, the walk also stops
+    when it has fetched as many pages as the pending resources, and the rest
+    are fetched by ID, which is used instead of the walk by the later polls,
+    while there are fewer pending resources than the pages.
+
+    The interval grows exponentially while none of them makes progress, and
+    resets when some of them reach the target state.
+    """
+
+    def __init__(self, fetch, key, predicate, failed=None, delay=1, max_delay=30,
+                 backoff=2, timeout=600, detail=None, page_size=100, max_workers=8):
+        """Create a new waiter.
+
+        @param fetch(callable): The function returning the iterable of the
+                                records, such as VMClient.iter_select.
+        @param key(string): The key of the record ID, such as "VM_Id".
+        @param predicate(callable): The function to check whether the record
+                                    has reached the target state, which is
+                                    called with None if the record is missing.
+        @param failed(callable): The function to check whether the record has
+                                 failed, then raise WaitFailed.
+        @param delay(float): The initial seconds between the polls.
+        @param max_delay(float): The maximum seconds between the polls.
+        @param backoff(float): The factor to grow the interval.
+        @param timeout(float): The maximum seconds to wait, which is capped
+                               by the deadline of the current thread.
+        @param detail(callable): The function to fetch the record by ID, which
+                                 returns None if the record is missing. If it
+                                 raises, the record is looked up by the walk.
+        @param page_size(int): The number of the records per page of fetch.
+        @param max_workers(int): The maximum number of the concurrent calls
+                                 of detail.
+        """
+        self._fetch = fetch
+        self._key = key
+        self._predicate = predicate
+        self._failed = failed
+        self._delay = delay
+        self._max_delay = max_delay
+        self._backoff = backoff
+        self._timeout = timeout
+        self._detail = detail
+        self._page_size = page_size
+        self._max_workers = max_workers
+
+        # The number of the pages known to exist, which is updated by the walks.
+        self._pages = None
+
+    def poll(self, ids):
+        """Return the records of the resources, and None for the missing ones."""
+        records = dict.fromkeys(ids)
+        pending = set(records)
+        if self._detail is not None and self._pages is not None and len(pending) < self._pages:
+            pending = self._poll_details(pending, records)
+        if pending:
+            self._poll_pages(pending, records)
+        return records
+
+    def _poll_details(self, ids, records):
+        """Fetch the records by ID, and return the IDs failed to fetch."""
+        failed = set()
+        for result in run_batch(self._detail, ids, max_workers=self._max_workers):
+            if result.ok:
+                records[result.item] = result.result
+            else:
+                failed.add(result.item)
+        return failed
+
+    def _poll_pages(self, ids, records):
+        """Look up the records by walking the pages."""
+        limit = None if self._detail is None else len(ids) * self._page_size
+        found = walked = 0
+        records_iter = iter(self._fetch())
+        try:
+            for record in records_iter:
+                walked += 1
+                rid = record.get(self._key)
+                if rid in ids and records[rid] is None:
+                    records[rid] = record
+                    found += 1
+                    if found == len(ids):
+                        return
+
+                if limit is not None and walked >= limit:
+                    # The rest pages cost more requests than fetching by ID.
+                    self._pages = max(self._pages or 0, walked // self._page_size + 1)
+                    ids = self._poll_details(set(r for r in ids if records[r] is None),
+                                             records)
+                    if not ids:
+                        return
+                    limit, found = None, 0
+        finally:
+            if hasattr(records_iter, "close"):
+                records_iter.close()
+
+        self._pages = -(-walked // self._page_size)
+
+    def wait(self, ids):
+        """Wait until all the resources reach the target state.
+
+        @param ids(iterable): The IDs of the resources.
+
+        @return(dict): The last records of the resources by the IDs, which is
+                       None if missing.
+        """
+        expires = monotonic() + self._timeout
+        deadline = current_deadline()
+        if deadline is not None:
+            expires = min(expires, monotonic() + deadline.remaining())
+
+        pending = set(ids)
+        results = {}
+        interval = None
+        while True:
+            done = len(results)
+            for rid, record in self.poll(pending).items():
+                if record is not None and self._failed and self._failed(record):
+                    raise WaitFailed("{} has failed".format(rid), record)
+                if self._predicate(record):
+                    results[rid] = record
+                    pending.discard(rid)
+
+            if not pending:
+                return results
+
+            remaining = expires - monotonic()
+            if remaining <= 0:
+                raise WaitTimeout("{} resources are still pending".format(len(pending)), pending)
+
+            if interval is None or len(results) > done:
+                interval = self._delay
+            else:
+                interval = min(self._max_delay, interval * self._backoff)
+            time.sleep(min(interval, remaining))
@@ -41,4 +41,5 @@ setup(
     scripts=[],
     python_requires='>=2.6,!=3.0.*,!=3.1.*,!=3.2.*',
     setup_requires=[],
+    extras_require={"async": ["aiohttp>=3.0"], "numpy": ["numpy"], "arrow": ["pyarrow"]},
     entry_points=entry_points)
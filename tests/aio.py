@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from __future__ import print_function
+
+import asyncio
+
+from byapi.aio import AsyncVMClient
+
+vmids = ["VM8baf5859582d1b6df91c3"]
+
+signature = "abcdefghijklmnopqrstuvwxyz1234567890"
+user_id = "10000123456"
+
+
+async def detail(client):
+    resp = await asyncio.gather(*(client.detail(vmid) for vmid in vmids))
+    print(resp)
+
+
+async def change_status(client):
+    status = "restart"  # start, down, restart
+    await asyncio.gather(*(client.change_status(vmid, status) for vmid in vmids))
+
+
+async def batch_detail(client):
+    for result in await client.batch_detail(vmids, max_workers=8):
+        print(result.item, result.get())
+
+
+async def test():
+    print("Start to test the async VM client")
+
+    async with AsyncVMClient(user_id=user_id, signature_key=signature) as client:
+        await detail(client)
+        # await change_status(client)
+        # await batch_detail(client)
+
+
+if __name__ == "__main__":
+    asyncio.run(test())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""The offline benchmarks of the clients against the local mock server.
+
+It measures the throughput and the p50/p99 latency of the sequential, the
+threaded, the batched, the process pool and the paginated workloads, for
+example,
+
+    python tests/bench.py --vms 20000 --latency 0.002 --requests 2000 --threads 16
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrent.futures import ThreadPoolExecutor
+from byapi import VMClient, IPClient
+from byapi.procpool import ProcessPool
+from byapi.utils import monotonic
+from mock_server import MockServer
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Result(object):
+    def __init__(self, name, operations, seconds, latencies, errors=0):
+        self.name = name
+        self.operations = operations
+        self.seconds = seconds
+        self.latencies = latencies
+        self.errors = errors
+
+    def __str__(self):
+        # The latencies are None if the workload has no latency per operation.
+        if self.latencies is None:
+            p50 = p99 = "n/a"
+        else:
+            p50 = "{:.2f}".format(percentile(self.latencies, 0.5) * 1000)
+            p99 = "{:.2f}".format(percentile(self.latencies, 0.99) * 1000)
+        return "{:<28} {:>8} {:>10.1f} {:>9} {:>9} {:>7}".format(
+            self.name, self.operations, self.operations / self.seconds, p50, p99, self.errors)
+
+
+class TimedVMClient(VMClient):
+    """TimedVMClient measures the latency of detail in the worker processes."""
+
+    def timed_detail(self, vmid):
+        started = monotonic()
+        result = self.detail(vmid)
+        return monotonic() - started, result
+
+
+def timed(func, latencies, lock=None):
+    def call(*args):
+        started = monotonic()
+        try:
+            return func(*args)
+        finally:
+            elapsed = monotonic() - started
+            if lock is None:
+                latencies.append(elapsed)
+            else:
+                with lock:
+                    latencies.append(elapsed)
+    return call
+
+
+def bench_sequential(client, ids):
+    latencies = []
+    detail = timed(client.detail, latencies)
+    started = monotonic()
+    for vmid in ids:
+        detail(vmid)
+    return Result("sequential detail", len(ids), monotonic() - started, latencies)
+
+
+def bench_threaded(client, ids, threads):
+    latencies, lock = [], threading.Lock()
+    detail = timed(client.detail, latencies, lock)
+    started = monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(detail, ids))
+    return Result("threaded detail x{}".format(threads), len(ids),
+                  monotonic() - started, latencies)
+
+
+def bench_batched(client, ids, threads):
+    # The same path as batch_detail, with each call of detail timed.
+    latencies, lock = [], threading.Lock()
+    detail = timed(client.detail, latencies, lock)
+    started = monotonic()
+    results = client._batch(detail, ids, threads, None)
+    seconds = monotonic() - started
+    errors = sum(1 for r in results if not r.ok)
+    return Result("batch_detail x{}".format(threads), len(ids), seconds, latencies, errors)
+
+
+def bench_process_pool(server, ids, processes, threads):
+    with ProcessPool(TimedVMClient, server.signature_key, server.user_id,
+                     processes=processes, threads=threads, host=server.url) as pool:
+        pool.map("timed_detail", ids[:processes])  # Start the workers.
+        started = monotonic()
+        results = pool.map("timed_detail", ids)
+        seconds = monotonic() - started
+    latencies = [r.result[0] for r in results if r.ok]
+    errors = sum(1 for r in results if not r.ok)
+    return Result("process pool {}x{}".format(processes, threads), len(ids), seconds,
+                  latencies, errors)
+
+
+def bench_paginated(name, func, page_size):
+    # The latency is the time to wait for each page of the records.
+    latencies = []
+    started = last = monotonic()
+    count = 0
+    for _ in func():
+        count += 1
+        if count % page_size == 0:
+            now = monotonic()
+            latencies.append(now - last)
+            last = now
+    return Result(name, count, monotonic() - started, latencies)
+
+
+def bench_select_all(name, func):
+    # The pages are fetched concurrently inside select_all, so only the
+    # throughput of the records is measured.
+    started = monotonic()
+    count = len(func())
+    return Result(name, count, monotonic() - started, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the clients against the mock server")
+    parser.add_argument("--vms", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.001,
+                        help="the server latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    with MockServer(vms=args.vms, latency=args.latency, jitter=args.jitter) as server:
+        kwargs = dict(host=server.url, pool_size=args.threads)
+        vm_client = VMClient(server.signature_key, server.user_id, **kwargs)
+        ip_client = IPClient(server.signature_key, server.user_id, **kwargs)
+
+        vms = server.api.inventory.vms
+        ids = [vms[i % len(vms)]["VM_Id"] for i in range(args.requests)]
+        page = args.page_size
+        threads_per_process = max(1, args.threads // args.processes)
+
+        results = [
+            bench_sequential(vm_client, ids),
+            bench_threaded(vm_client, ids, args.threads),
+            bench_batched(vm_client, ids, args.threads),
+            bench_process_pool(server, ids, args.processes, threads_per_process),
+            bench_paginated("iter_select vm",
+                            lambda: vm_client.iter_select(page_size=page), page),
+            bench_paginated("iter_select vm prefetch",
+                            lambda: vm_client.iter_select(page_size=page, prefetch=True), page),
+            bench_select_all("select_all vm x4",
+                             lambda: vm_client.select_all(page_size=page, max_workers=4)),
+            bench_select_all("select_all ip x4",
+                             lambda: ip_client.select_all(page_size=page, max_workers=4)),
+        ]
+        vm_client.close()
+        ip_client.close()
+
+    print("{:<28} {:>8} {:>10} {:>9} {:>9} {:>7}".format(
+        "workload", "ops", "ops/s", "p50(ms)", "p99(ms)", "errors"))
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
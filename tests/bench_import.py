@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""The benchmark of the cold start of the package.
+
+Each case runs in a new interpreter several times, and prints the median
+seconds and the heavy modules which have been imported, for example,
+
+    python tests/bench_import.py --runs 20
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("import byapi", "import byapi"),
+    ("from byapi import ProjectClient", "from byapi import ProjectClient"),
+    ("from byapi import VMClient", "from byapi import VMClient"),
+    ("ProjectClient()", "from byapi import ProjectClient\n"
+                        "ProjectClient('key', 'user').close()"),
+    ("all clients", "from byapi import *"),
+]
+
+HEAVY = ["requests", "urllib3", "concurrent.futures", "aiohttp", "orjson", "ujson", "byapi.vm",
+         "byapi.ip", "byapi.sg", "byapi.image", "byapi.project"]
+
+SCRIPT = """
+import sys, time
+started = time.time()
+{code}
+elapsed = time.time() - started
+import json
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def run(code):
+    script = SCRIPT.format(code=code, heavy=HEAVY)
+    out = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT)
+    return json.loads(out.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of byapi")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print("{:<36} {:>10}  {}".format("case", "median(ms)", "heavy modules"))
+    for name, code in CASES:
+        times, modules = [], []
+        for _ in range(args.runs):
+            elapsed, modules = run(code)
+            times.append(elapsed)
+        times.sort()
+        print("{:<36} {:>10.2f}  {}".format(name, times[len(times) // 2] * 1000,
+                                            ", ".join(modules) or "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,11 @@ def select():
     print(resp)
 
 
+def select_all():
+    ips = client.select_all(page_size=100, max_workers=4)
+    print(len(ips))
+
+
 def update():
     client.update(group_id, 3)
 
@@ -56,6 +61,9 @@ def test():
     # print("Select IP")
     # select()
 
+    # print("Select all IPs")
+    # select_all()
+
     # print("Update IP")
     # update()
 
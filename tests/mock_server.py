@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""A local mock server of the BiggerYun API for the offline tests and benchmarks.
+
+It implements vmAdd, vmSelect, vmDetail, netSelect, securitySelect,
+imageSelect and projectSelect over the generated inventories, verifies the
+signatures, and can inject the latency and the errors. The arguments can be
+sent in the URL query, or in the form or JSON body, which may be gzipped, by
+POST. For example,
+
+    with MockServer(vms=20000, latency=0.005) as server:
+        client = VMClient(server.signature_key, server.user_id, host=server.url)
+        print(client.select(limit=10))
+
+Or run it standalone: python tests/mock_server.py --port 8080 --vms 20000
+"""
+from __future__ import print_function
+
+import argparse
+import gzip
+import io
+import json
+import random
+import threading
+import time
+
+from hashlib import md5
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl, urlparse
+
+SIGNATURE_KEY = "abcdefghijklmnopqrstuvwxyz1234567890"
+USER_ID = "10000123456"
+
+# The default order field and the filters (argument -> record field) of the selects.
+SELECTS = {
+    "vmSelect": ("vms", "VM_Name", {"Outer_Ip": "Outer_Ip", "VM_Name": "VM_Name"}),
+    "netSelect": ("ips", "Outer_Ip", {"Group_Id": "Group_Id", "Status": "Status",
+                                      "Outer_Ip": "Outer_Ip", "VM_Name": "VM_Name"}),
+    "securitySelect": ("sgs", "Create_Time", {"Security_Group_Name": "Security_Group_Name"}),
+    "imageSelect": ("images", "Image_Name", {"Image_Name": "Image_Name"}),
+    "imageBaseSelect": ("base_images", "Image_Name", {"Image_Name": "Image_Name",
+                                                      "Image_Type": "Image_Type"}),
+    "projectSelect": ("projects", "create_time", {}),
+}
+
+# The order fields of the API which are not the same as the record fields.
+ORDER_FIELDS = {"NAME": None, "RI_GROUP_IP": "Outer_Ip", "OS_VERSION": "OS_Version",
+                "RI_END_TIME": "End_Time"}
+
+
+def sign(params, signature_key):
+    kvs = sorted(params.items())
+    data = "".join("{0}{1}".format(k, v) for k, v in kvs) + signature_key
+    return md5(data.encode("utf-8")).hexdigest()
+
+
+class Inventory(object):
+    """Inventory is the generated resources of the mock server."""
+
+    def __init__(self, vms=1000, ips=None, sgs=20, images=50, projects=5, seed=0):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+        self.sgs = [{"Security_Group_Id": "GRP%020x" % i,
+                     "Security_Group_Name": "sg-%d" % i,
+                     "Create_Time": "2020-01-01 00:%02d:%02d" % divmod(i % 3600, 60)}
+                    for i in range(sgs)]
+        self.images = [{"Image_Id": "IMG%020x" % i, "Image_Name": "image-%d" % i,
+                        "Image_Note": "", "Status": "available"} for i in range(images)]
+        self.base_images = [{"Image_Id": "IMGBASE%016x" % i, "Image_Name": "base-%d" % i,
+                             "Image_Type": rnd.choice(["Base", "Integration"])}
+                            for i in range(images)]
+        self.projects = [{"Project_Id": "%d" % i, "Project_Name": "project-%d" % i,
+                          "create_time": "2020-01-%02d 00:00:00" % (i % 28 + 1)}
+                         for i in range(projects)]
+        self.vms = []
+        self.vms_by_id = {}
+        self.ips = []
+        for _ in range(vms):
+            self.add_vm(rnd, "vm", rnd.choice([1, 2, 4]), 4, rnd.choice([0, 2, 5, 10]))
+        for _ in range(ips or 0):
+            self.add_ip(rnd.choice([2, 5, 10]))
+
+    def add_ip(self, bandwidth, vm=None):
+        self.next_id += 1
+        n = self.next_id
+        ip = {"Group_Id": "GID%020x" % n,
+              "Outer_Ip": "10.%d.%d.%d" % (n >> 16 & 255, n >> 8 & 255, n & 255),
+              "Bandwidth": bandwidth, "Status": "bind" if vm else "unbind",
+              "VM_Name": vm["VM_Name"] if vm else ""}
+        self.ips.append(ip)
+        return ip
+
+    def add_vm(self, rnd, name, cpu, memory, bandwidth, sg_id="", image_id=""):
+        self.next_id += 1
+        vm = {"VM_Id": "VM%020x" % self.next_id, "VM_Name": "%s-%d" % (name, self.next_id),
+              "ECU": cpu, "Memory_Size": memory, "Status": "running",
+              "Security_Group_Id": sg_id, "Image_Id": image_id,
+              "OS_Version": rnd.choice(["CentOS 7", "Ubuntu 20.04", "Windows 2016"]),
+              "End_Time": "2030-01-01 00:00:00", "Bandwidth": bandwidth,
+              "Outer_Ip": "", "Group_Id": ""}
+        if bandwidth:
+            ip = self.add_ip(bandwidth, vm)
+            vm["Outer_Ip"], vm["Group_Id"] = ip["Outer_Ip"], ip["Group_Id"]
+        self.vms.append(vm)
+        self.vms_by_id[vm["VM_Id"]] = vm
+        return vm
+
+
+class APIError(Exception):
+    def __init__(self, code, msg):
+        super(APIError, self).__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+class MockAPI(object):
+    """MockAPI handles the actions of the API."""
+
+    def __init__(self, inventory, signature_key=SIGNATURE_KEY, user_id=USER_ID,
+                 latency=0, jitter=0, error_rate=0, http_error_rate=0):
+        self.inventory = inventory
+        self.signature_key = signature_key
+        self.user_id = user_id
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.requests = 0
+        self._rnd = random.Random()
+        self._lock = threading.Lock()
+
+    def handle(self, action, params):
+        """Return (HTTP status, response body)."""
+        with self._lock:
+            self.requests += 1
+        delay = self.latency + (self._rnd.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if self.http_error_rate and self._rnd.random() < self.http_error_rate:
+            return 503, b"Service Unavailable"
+
+        try:
+            if self.error_rate and self._rnd.random() < self.error_rate:
+                raise APIError(500, "injected error")
+            self.verify(params)
+            handler = getattr(self, "do_" + action, None)
+            if handler is None:
+                raise APIError(404, "unknown action {}".format(action))
+            data = handler(params)
+            resp = {"code": 200, "msg": "ok", "time": int(time.time()), "data": data}
+        except APIError as err:
+            resp = {"code": err.code, "msg": err.msg, "time": int(time.time()), "data": None}
+        return 200, json.dumps(resp).encode("utf-8")
+
+    def verify(self, params):
+        signature = params.pop("Signature", None)
+        if params.get("User_Id") != self.user_id:
+            raise APIError(401, "unknown user")
+        if signature != sign(params, self.signature_key):
+            raise APIError(401, "invalid signature")
+
+    def _select(self, action, params):
+        name, default_order, filters = SELECTS[action]
+        with self.inventory.lock:
+            records = list(getattr(self.inventory, name))
+
+        for arg, field in filters.items():
+            if params.get(arg):
+                records = [r for r in records if r.get(field) == params[arg]]
+
+        order_by = params.get("Order_By", default_order)
+        field = ORDER_FIELDS.get(order_by, order_by) or default_order
+        records.sort(key=lambda r: "{}".format(r.get(field, "")),
+                     reverse=params.get("Order") == "desc")
+
+        offset = int(params.get("Offset", 0))
+        limit = int(params.get("Limit", 20))
+        return {"count": len(records), "list": records[offset:offset + limit]}
+
+    def do_vmSelect(self, params):
+        return self._select("vmSelect", params)
+
+    def do_netSelect(self, params):
+        return self._select("netSelect", params)
+
+    def do_securitySelect(self, params):
+        return self._select("securitySelect", params)
+
+    def do_imageSelect(self, params):
+        return self._select("imageSelect", params)
+
+    def do_imageBaseSelect(self, params):
+        return self._select("imageBaseSelect", params)
+
+    def do_projectSelect(self, params):
+        return self._select("projectSelect", params)
+
+    def do_vmDetail(self, params):
+        with self.inventory.lock:
+            vm = self.inventory.vms_by_id.get(params.get("VM_Id"))
+        if vm is not None:
+            return vm
+        raise APIError(404, "the VM does not exist")
+
+    def do_vmAdd(self, params):
+        for key in ("VM_Name", "Password", "Image_Id", "Security_Group_Id"):
+            if not params.get(key):
+                raise APIError(400, "missing {}".format(key))
+
+        results = []
+        with self.inventory.lock:
+            for _ in range(int(params.get("VM_Num", 1))):
+                vm = self.inventory.add_vm(self._rnd, params["VM_Name"], int(params["ECU"]),
+                                           int(params["Memory_Size"]),
+                                           int(params.get("Bandwidth", 0)),
+                                           params["Security_Group_Id"], params["Image_Id"])
+                results.append(vm["VM_Id"] + ("|" + vm["Group_Id"] if vm["Group_Id"] else ""))
+        return {"VG_Id": ",".join(results)}
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._respond(url.path.rsplit("/", 1)[-1], dict(parse_qsl(url.query, keep_blank_values=True)))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+        body = body.decode("utf-8")
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body) if body else {}
+        else:
+            params = dict(parse_qsl(body, keep_blank_values=True))
+        self._respond(urlparse(self.path).path.rsplit("/", 1)[-1], params)
+
+    def _respond(self, action, params):
+        status, body = self.server.api.handle(action, params)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockServer(object):
+    """MockServer runs the mock API on a local port in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, vms=1000, ips=None, sgs=20, images=50,
+                 projects=5, seed=0, **kwargs):
+        """Create a new mock server.
+
+        @param port(int): The port to listen. If 0, use a free port.
+        @param vms(int): The number of the generated VMs.
+        @param ips(int): The number of the generated public ips without VM.
+
+        The rest keyword arguments are passed to MockAPI, such as latency,
+        jitter, error_rate and http_error_rate.
+        """
+        self.api = MockAPI(Inventory(vms, ips, sgs, images, projects, seed), **kwargs)
+        self._server = _Server((host, port), _Handler)
+        self._server.api = self.api
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def signature_key(self):
+        return self.api.signature_key
+
+    @property
+    def user_id(self):
+        return self.api.user_id
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock BiggerYun API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--vms", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    server = MockServer(args.host, args.port, vms=args.vms, latency=args.latency,
+                        error_rate=args.error_rate)
+    print("Listen on {}, signature_key={}, user_id={}".format(
+        server.url, server.signature_key, server.user_id))
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
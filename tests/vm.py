@@ -26,6 +26,31 @@ def select():
     print(info)
 
 
+def select_by_post():
+    post_client = VMClient(user_id=user_id, signature_key=signature, post=True,
+                           body_encodings={"vmSelect": "json"}, gzip_size=1024)
+    info = post_client.select()
+    print(info)
+
+
+def iter_select():
+    for vm in client.iter_select(page_size=50, prefetch=True):
+        print(vm)
+
+
+def stream_select():
+    for vm in client.iter_select(page_size=1000, stream=True):
+        print(vm)
+
+
+def select_models():
+    from byapi.models import VM, RecordBatch
+
+    vms = client.select_all(as_models=True)
+    batch = RecordBatch.from_models(VM, vms)
+    print(batch.sum("bandwidth"), batch.group_sum("os_version", "memory_size"))
+
+
 def update():
     cpu = 4
     memory = 4
@@ -54,17 +79,42 @@ def delete():
     client.delete(vmid)
 
 
+def batch_change_status():
+    results = client.batch_change_status([vmid], "restart", max_workers=4)
+    print(results)
+
+
+def process_pool_detail():
+    from byapi.procpool import ProcessPool
+
+    with ProcessPool(VMClient, signature, user_id, processes=4) as pool:
+        for result in pool.imap("detail", [vmid] * 100):
+            print(result)
+
+
+def wait_until_running():
+    resp = client.wait_until_running([vmid], timeout=300)
+    print(resp)
+
+
 def test():
     print("Start to test VM")
 
     # create()
     # select()
+    # select_by_post()
+    # iter_select()
+    # stream_select()
+    # select_models()
     # update()
     # change_status()
     # detail()
     # power_down()
     # check_name()
     # delete()
+    # batch_change_status()
+    # process_pool_detail()
+    # wait_until_running()
 
 
 if __name__ == "__main__":